@@ -0,0 +1,223 @@
+import os
+import shutil
+import tempfile
+import numpy as np
+
+from .synthetic import make_case, flood_blob
+
+# The hot paths are imported inside setup so the import cost is not timed
+SIZES = [1024, 4096]
+
+
+class EvaluationMetrics:
+    params = SIZES
+    param_names = ["size"]
+
+    def setup(self, size):
+        from fimeval.ContingencyMap.metrics import evaluationmetrics
+
+        self.evaluationmetrics = evaluationmetrics
+        self.benchmark = np.where(flood_blob(size, seed=0) > 0, 2, 0).astype(np.uint8)
+        self.candidate = np.where(flood_blob(size, seed=1) > 0, 2, 1).astype(np.uint8)
+
+    def time_evaluationmetrics(self, size):
+        self.evaluationmetrics(self.benchmark, self.candidate)
+
+    def peakmem_evaluationmetrics(self, size):
+        self.evaluationmetrics(self.benchmark, self.candidate)
+
+
+class EvaluateFIM:
+    params = (SIZES, [False, True], [0.01, 0.1])
+    param_names = ["size", "streaming", "pwb_density"]
+    number = 1
+    timeout = 600
+
+    def setup(self, size, streaming, pwb_density):
+        from fimeval.ContingencyMap.evaluationFIM import evaluateFIM
+
+        self.evaluateFIM = evaluateFIM
+        self.root = tempfile.mkdtemp(prefix="fimeval-bench-")
+        self.case_dir, self.pwb_path, _ = make_case(
+            self.root, size, pwb_density=pwb_density
+        )
+        self.benchmark = os.path.join(self.case_dir, "BM_benchmark.tif")
+        self.candidates = [
+            os.path.join(self.case_dir, name)
+            for name in sorted(os.listdir(self.case_dir))
+            if name.startswith("model")
+        ]
+
+    def teardown(self, size, streaming, pwb_density):
+        shutil.rmtree(self.root, ignore_errors=True)
+
+    def run(self, streaming):
+        self.evaluateFIM(
+            self.benchmark,
+            self.candidates,
+            self.pwb_path,
+            self.case_dir,
+            "smallest_extent",
+            os.path.join(self.root, "out"),
+            streaming=streaming,
+        )
+
+    def time_evaluateFIM(self, size, streaming, pwb_density):
+        self.run(streaming)
+
+    def peakmem_evaluateFIM(self, size, streaming, pwb_density):
+        self.run(streaming)
+
+
+class MakeFIMsUniform:
+    params = (SIZES, [None, "crs", "resolution"], [True, False])
+    param_names = ["size", "mismatch", "virtual"]
+    number = 1
+    timeout = 600
+
+    def setup(self, size, mismatch, virtual):
+        from fimeval.utilis import MakeFIMsUniform, release_harmonized
+
+        self.MakeFIMsUniform = MakeFIMsUniform
+        self.release_harmonized = release_harmonized
+        self.root = tempfile.mkdtemp(prefix="fimeval-bench-")
+        self.case_dir, _, _ = make_case(self.root, size, mismatch=mismatch)
+
+    def teardown(self, size, mismatch, virtual):
+        shutil.rmtree(self.root, ignore_errors=True)
+
+    def run(self, virtual):
+        paths = self.MakeFIMsUniform(
+            self.case_dir, target_crs="EPSG:32616", virtual=virtual
+        )
+        self.release_harmonized(paths)
+
+    def time_MakeFIMsUniform(self, size, mismatch, virtual):
+        self.run(virtual)
+
+    def peakmem_MakeFIMsUniform(self, size, mismatch, virtual):
+        self.run(virtual)
+
+
+class ConvexHull:
+    params = SIZES
+    param_names = ["size"]
+    number = 1
+
+    def setup(self, size):
+        from fimeval.ContingencyMap.methods import convex_hull
+
+        self.convex_hull = convex_hull
+        self.root = tempfile.mkdtemp(prefix="fimeval-bench-")
+        self.case_dir, _, _ = make_case(self.root, size, candidates=0)
+        self.benchmark = os.path.join(self.case_dir, "BM_benchmark.tif")
+
+    def teardown(self, size):
+        shutil.rmtree(self.root, ignore_errors=True)
+
+    def time_convex_hull(self, size):
+        self.convex_hull(self.benchmark, self.root)
+
+    def peakmem_convex_hull(self, size):
+        self.convex_hull(self.benchmark, self.root)
+
+
+# Evaluated case shared by the building footprint and rendering benchmarks
+def evaluated_case(root, size, buildings):
+    from fimeval.ContingencyMap.evaluationFIM import evaluateFIM
+
+    case_dir, pwb_path, buildings_path = make_case(
+        root, size, candidates=1, buildings=buildings
+    )
+    out_dir = os.path.join(root, "out")
+    evaluateFIM(
+        os.path.join(case_dir, "BM_benchmark.tif"),
+        [os.path.join(case_dir, "model0.tif")],
+        pwb_path,
+        case_dir,
+        "smallest_extent",
+        out_dir,
+    )
+    method_path = os.path.join(out_dir, "case", "smallest_extent")
+    return method_path, buildings_path
+
+
+class FloodedBuildingCount:
+    params = ([1024], [1000, 100000])
+    param_names = ["size", "buildings"]
+    number = 1
+    timeout = 600
+
+    def setup(self, size, buildings):
+        from fimeval.BuildingFootprint.evaluationwithBF import (
+            GetFloodedBuildingCountInfo,
+        )
+
+        self.GetFloodedBuildingCountInfo = GetFloodedBuildingCountInfo
+        self.root = tempfile.mkdtemp(prefix="fimeval-bench-")
+        self.method_path, self.buildings_path = evaluated_case(
+            self.root, size, buildings
+        )
+
+    def teardown(self, size, buildings):
+        shutil.rmtree(self.root, ignore_errors=True)
+
+    def run(self):
+        # Drop the centroid cache so every run reads the footprints
+        shutil.rmtree(
+            os.path.join(self.method_path, "BuildingFootprint"), ignore_errors=True
+        )
+        clipped = os.path.join(self.method_path, "MaskedFIMwithBoundary")
+        self.GetFloodedBuildingCountInfo(
+            self.buildings_path,
+            os.path.join(
+                self.method_path, "BoundaryforEvaluation", "FIMEvaluatedExtent.shp"
+            ),
+            os.path.join(clipped, "BM_benchmark_clipped.tif"),
+            os.path.join(clipped, "model0_clipped.tif"),
+            os.path.join(
+                self.method_path, "ContingencyMaps", "ContingencyMAP_model0.tif"
+            ),
+            self.method_path,
+            "model0",
+        )
+
+    def time_GetFloodedBuildingCountInfo(self, size, buildings):
+        self.run()
+
+    def peakmem_GetFloodedBuildingCountInfo(self, size, buildings):
+        self.run()
+
+
+class ContingencyMapRendering:
+    params = (SIZES, [False, True])
+    param_names = ["size", "overview"]
+    number = 1
+    timeout = 600
+
+    def setup(self, size, overview):
+        import matplotlib
+
+        matplotlib.use("Agg")
+        from fimeval.ContingencyMap.printcontingency import getContingencyMap
+
+        self.getContingencyMap = getContingencyMap
+        self.root = tempfile.mkdtemp(prefix="fimeval-bench-")
+        self.method_path, _ = evaluated_case(self.root, size, 10)
+        self.contingency = os.path.join(
+            self.method_path, "ContingencyMaps", "ContingencyMAP_model0.tif"
+        )
+
+    def teardown(self, size, overview):
+        shutil.rmtree(self.root, ignore_errors=True)
+
+    def run(self, overview):
+        self.getContingencyMap(
+            self.contingency, self.method_path, overview=overview, dpi=100, show=False
+        )
+
+    def time_getContingencyMap(self, size, overview):
+        self.run(overview)
+
+    def peakmem_getContingencyMap(self, size, overview):
+        self.run(overview)
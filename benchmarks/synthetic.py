@@ -0,0 +1,119 @@
+import os
+import numpy as np
+import rasterio
+import geopandas as gpd
+from rasterio.transform import from_origin
+from rasterio.warp import calculate_default_transform, reproject, Resampling
+from shapely.geometry import Point, box
+
+# Projected CRS and origin of the synthetic FIMs (UTM 16N, Alabama)
+CRS = "EPSG:32616"
+ORIGIN = (500000.0, 3700000.0)
+RESOLUTION = 10.0
+NODATA = -9999.0
+
+
+# Wet/dry raster of a noisy flood blob, flood extent jittered by seed
+def flood_blob(size, seed=0, radius=0.35):
+    rng = np.random.default_rng(seed)
+    rows, cols = np.ogrid[:size, :size]
+    centre = size / 2 + rng.normal(0, size * 0.01, 2)
+    distance = np.hypot(rows - centre[0], cols - centre[1]) / size
+    edge = radius + rng.normal(0, 0.01, (size, size))
+    return (distance < edge).astype(np.float32)
+
+
+# Write a synthetic FIM GeoTIFF, optionally reprojected and/or resampled
+def write_fim(path, size, seed=0, crs=None, resolution=None):
+    transform = from_origin(*ORIGIN, RESOLUTION, RESOLUTION)
+    data = flood_blob(size, seed)
+    data[:2, :] = NODATA
+    profile = {
+        "driver": "GTiff",
+        "dtype": "float32",
+        "count": 1,
+        "width": size,
+        "height": size,
+        "crs": CRS,
+        "transform": transform,
+        "nodata": NODATA,
+        "tiled": True,
+        "blockxsize": 256,
+        "blockysize": 256,
+    }
+    if crs is None and resolution is None:
+        with rasterio.open(path, "w", **profile) as dst:
+            dst.write(data, 1)
+        return path
+
+    dst_crs = crs or CRS
+    bounds = rasterio.transform.array_bounds(size, size, transform)
+    dst_transform, width, height = calculate_default_transform(
+        CRS, dst_crs, size, size, *bounds, resolution=resolution
+    )
+    profile.update(crs=dst_crs, transform=dst_transform, width=width, height=height)
+    with rasterio.open(path, "w", **profile) as dst:
+        reproject(
+            data,
+            rasterio.band(dst, 1),
+            src_transform=transform,
+            src_crs=CRS,
+            src_nodata=NODATA,
+            dst_transform=dst_transform,
+            dst_crs=dst_crs,
+            resampling=Resampling.nearest,
+        )
+    return path
+
+
+# Footprint of the synthetic FIMs in their projected CRS
+def fim_bounds(size):
+    left, top = ORIGIN
+    return box(left, top - size * RESOLUTION, left + size * RESOLUTION, top)
+
+
+# Permanent water bodies as random circles, `density` is the covered fraction
+def write_pwb(path, size, density=0.02, seed=0):
+    rng = np.random.default_rng(seed)
+    extent = fim_bounds(size)
+    radius = size * RESOLUTION * 0.02
+    count = max(1, int(density * extent.area / (np.pi * radius**2)))
+    minx, miny, maxx, maxy = extent.bounds
+    xs = rng.uniform(minx, maxx, count)
+    ys = rng.uniform(miny, maxy, count)
+    circles = [Point(x, y).buffer(radius) for x, y in zip(xs, ys)]
+    gpd.GeoDataFrame(geometry=circles, crs=CRS).to_file(path)
+    return path
+
+
+# Square building footprints scattered over the FIM extent
+def write_buildings(path, size, count=1000, seed=0):
+    rng = np.random.default_rng(seed)
+    minx, miny, maxx, maxy = fim_bounds(size).bounds
+    xs = rng.uniform(minx, maxx, count)
+    ys = rng.uniform(miny, maxy, count)
+    footprints = [box(x, y, x + 12, y + 12) for x, y in zip(xs, ys)]
+    gpd.GeoDataFrame(geometry=footprints, crs=CRS).to_file(path, driver="GPKG")
+    return path
+
+
+# Case folder with a benchmark and candidate FIMs, plus PWB and buildings files
+def make_case(root, size, candidates=2, mismatch=None, pwb_density=0.02, buildings=1000):
+    """
+    mismatch is None, "crs" (candidates in EPSG:4326) or "resolution"
+    (candidates at 1.5x the benchmark pixel size).
+    """
+    case_dir = os.path.join(root, "case")
+    os.makedirs(case_dir, exist_ok=True)
+    write_fim(os.path.join(case_dir, "BM_benchmark.tif"), size, seed=0)
+    for idx in range(candidates):
+        kwargs = {}
+        if mismatch == "crs":
+            kwargs["crs"] = "EPSG:4326"
+        elif mismatch == "resolution":
+            kwargs["resolution"] = RESOLUTION * 1.5
+        write_fim(os.path.join(case_dir, f"model{idx}.tif"), size, seed=idx + 1, **kwargs)
+
+    pwb_path = write_pwb(os.path.join(root, "pwb.shp"), size, pwb_density)
+    buildings_path = write_buildings(os.path.join(root, "buildings.gpkg"), size, buildings)
+    return case_dir, pwb_path, buildings_path
@@ -1,3 +1,10 @@
-from .evaluationwithBF import EvaluationWithBuildingFootprint
+from ..lazyimports import lazy_attributes
 
-__all__ = ["EvaluationWithBuildingFootprint"]
+# Entry points are imported on first use, see fimeval/__init__.py
+_LAZY_ATTRS = {
+    "EvaluationWithBuildingFootprint": ".evaluationwithBF",
+}
+
+__all__ = list(_LAZY_ATTRS)
+
+__getattr__, __dir__ = lazy_attributes(__name__, _LAZY_ATTRS)
@@ -1,12 +1,16 @@
 import os
-import ee
+import hashlib
 import glob
 import geopandas as gpd
 import rasterio
+import numpy as np
+import shapely
 import pandas as pd
 from pathlib import Path
-from plotly.subplots import make_subplots
-import plotly.graph_objects as go
+from rasterio.windows import Window
+
+from ..ContingencyMap.streaming import get_block_shape
+from ..utilis import read_features_around
 
 
 def Changeintogpkg(input_path, output_dir, layer_name):
@@ -21,6 +25,153 @@ def Changeintogpkg(input_path, output_dir, layer_name):
         gdf.to_file(output_gpkg, driver="GPKG")
         return output_gpkg
 
+#Centroids of the building footprints clipped to the study area
+def clipped_centroids(building_gdf, study_area_gdf):
+    """
+    Same centroids as gpd.overlay(..., how="intersection") followed by
+    .centroid, without intersecting every footprint: candidate pairs come from
+    the study area spatial index, footprints within a study area polygon keep
+    their own centroid and only the few straddling its edge are intersected.
+    """
+    buildings = np.asarray(building_gdf.geometry.array)
+    areas = np.asarray(study_area_gdf.geometry.array)
+    building_idx, area_idx = study_area_gdf.sindex.query(
+        buildings, predicate="intersects"
+    )
+    pairs_b, pairs_a = buildings[building_idx], areas[area_idx]
+    within = shapely.within(pairs_b, pairs_a)
+
+    pieces = shapely.intersection(pairs_b[~within], pairs_a[~within])
+    pieces = pieces[shapely.area(pieces) > 0]
+    centroids = np.concatenate(
+        [shapely.centroid(pairs_b[within]), shapely.centroid(pieces)]
+    )
+    return gpd.GeoSeries(centroids, crs=building_gdf.crs)
+
+#Cache key of the clipped centroids: footprint and boundary sources plus the target CRS
+def centroid_cache_key(building_fp_path, study_area, crs):
+    digest = hashlib.sha1(crs.to_wkt().encode())
+    for source in (building_fp_path, study_area):
+        if isinstance(source, gpd.GeoDataFrame):
+            digest.update(str(source.crs).encode())
+            for geom in source.geometry:
+                digest.update(geom.wkb)
+        else:
+            stat = os.stat(source)
+            digest.update(f"{os.path.abspath(source)}:{stat.st_size}:{stat.st_mtime_ns}".encode())
+    return digest.hexdigest()[:16]
+
+#x/y arrays of the building centroids clipped to the study area, in crs
+def building_centroids(building_fp_path, study_area, crs, cache_dir=None):
+    """
+    Only the footprints inside the study area bounding box are read (bbox
+    pushdown), reprojected once and reduced to their clipped centroids. The
+    centroids are kept as a small .npz in cache_dir, keyed by the footprint and
+    boundary sources and the CRS, so other candidates and reruns skip the read;
+    entries of other keys are removed when a new one is written.
+    study_area is a vector file path or a GeoDataFrame.
+    """
+    cache_path = None
+    if cache_dir:
+        os.makedirs(cache_dir, exist_ok=True)
+        key = centroid_cache_key(building_fp_path, study_area, crs)
+        cache_path = os.path.join(cache_dir, f"BuildingCentroids_{key}.npz")
+        if os.path.exists(cache_path):
+            with np.load(cache_path) as cached:
+                return cached["x"], cached["y"]
+
+    if isinstance(study_area, gpd.GeoDataFrame):
+        study_area_gdf = study_area
+    else:
+        study_area_gdf = gpd.read_file(study_area)
+    building_gdf, _ = read_features_around(building_fp_path, study_area_gdf.geometry)
+
+    if not building_gdf.crs.equals(crs):
+        building_gdf = building_gdf.to_crs(crs)
+    if not study_area_gdf.crs.equals(crs):
+        study_area_gdf = study_area_gdf.to_crs(crs)
+
+    centroids = clipped_centroids(building_gdf, study_area_gdf)
+    xs, ys = centroids.x.to_numpy(), centroids.y.to_numpy()
+    if cache_path:
+        tmp_path = f"{cache_path}.tmp.npz"
+        np.savez(tmp_path, x=xs, y=ys)
+        os.replace(tmp_path, cache_path)
+        # Entries of older footprint or boundary sources are never read again
+        for stale_path in glob.glob(os.path.join(cache_dir, "BuildingCentroids_*.npz")):
+            if stale_path == cache_path or stale_path.endswith(".tmp.npz"):
+                continue
+            try:
+                os.remove(stale_path)
+            except FileNotFoundError:
+                pass
+    return xs, ys
+
+#Row/column of the pixels under the points, and whether each point falls on the raster
+def points_to_rowcol(transform, shape, xs, ys):
+    cols, rows = ~transform * (np.asarray(xs, dtype=np.float64), np.asarray(ys, dtype=np.float64))
+    rows = np.floor(rows).astype(np.int64)
+    cols = np.floor(cols).astype(np.int64)
+    inside = (rows >= 0) & (rows < shape[0]) & (cols >= 0) & (cols < shape[1])
+    return rows, cols, inside
+
+#Pixel values at the given rows/cols, reading only the blocks that contain points
+def read_pixels_by_block(src, rows, cols, block_size=None):
+    # Native GeoTIFF tiles/strips, so a sparse point set never pulls in whole neighbouring blocks
+    if block_size:
+        block_h, block_w = get_block_shape(src, block_size)
+    else:
+        block_h, block_w = src.block_shapes[0]
+    if rows.size == 0:
+        return np.empty(0, dtype=src.dtypes[0])
+    n_block_cols = -(-src.width // block_w)
+    keys = (rows // block_h) * n_block_cols + cols // block_w
+    order = np.argsort(keys, kind="stable")
+    keys = keys[order]
+    starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+    ends = np.r_[starts[1:], len(keys)]
+
+    values = np.empty(len(rows), dtype=src.dtypes[0])
+    for start, end in zip(starts, ends):
+        row_off = int(keys[start] // n_block_cols) * block_h
+        col_off = int(keys[start] % n_block_cols) * block_w
+        window = Window(
+            col_off,
+            row_off,
+            min(block_w, src.width - col_off),
+            min(block_h, src.height - row_off),
+        )
+        idx = order[start:end]
+        values[idx] = src.read(1, window=window)[rows[idx] - row_off, cols[idx] - col_off]
+    return values
+
+#Histogram of the uint8 class values under the points for each raster
+def sample_class_histograms(raster_paths, xs, ys, windowed=True, block_size=None):
+    """
+    Sample all rasters at the points in one pass: the inverse affine is applied
+    to every point at once (and reused while rasters share a grid), the values
+    are gathered with fancy indexing and tallied with a single bincount.
+    With windowed=True only the raster blocks holding points are read, so
+    sparsely built scenes read a fraction of the pixels and memory stays
+    bounded by the block size; windowed=False reads each raster whole.
+    """
+    histograms = []
+    grid, rows, cols = None, None, None
+    for raster_path in raster_paths:
+        with rasterio.open(raster_path) as src:
+            if grid != (src.transform, src.shape):
+                grid = (src.transform, src.shape)
+                rows, cols, inside = points_to_rowcol(src.transform, src.shape, xs, ys)
+                rows, cols = rows[inside], cols[inside]
+            if windowed:
+                values = read_pixels_by_block(src, rows, cols, block_size)
+            else:
+                values = src.read(1)[rows, cols]
+        if values.dtype != np.uint8:
+            values = values[(values >= 0) & (values < 256)].astype(np.int64)
+        histograms.append(np.bincount(values, minlength=256)[:256])
+    return histograms
+
 def GetFloodedBuildingCountInfo(
     building_fp_path,
     study_area_path,
@@ -29,76 +180,60 @@ def GetFloodedBuildingCountInfo(
     contingency_map,
     save_dir,
     basename,
+    windowed=True,
 ):
-    output_dir = os.path.dirname(building_fp_path)
-
-    building_fp_gpkg = Changeintogpkg(
-        building_fp_path, output_dir, "building_footprint"
-    )
-
-    building_gdf = gpd.read_file(building_fp_gpkg)
-    study_area_gdf = gpd.read_file(study_area_path)
-
     with rasterio.open(raster1_path) as src:
-        target_crs = str(src.crs)
-
-    # Reproject all GeoDataFrames to the target CRS
-    if building_gdf.crs != target_crs:
-        building_gdf = building_gdf.to_crs(target_crs)
-        print("reproject building_gdf")
-
-    if study_area_gdf.crs != target_crs:
-        study_area_gdf = study_area_gdf.to_crs(target_crs)
-        print("reproject study_area_gdf")
-
-    clipped_buildings = gpd.overlay(building_gdf, study_area_gdf, how="intersection")
-    clipped_buildings["centroid"] = clipped_buildings.geometry.centroid
-
-    centroid_counts = {
-        "Benchmark": 0,
-        "Candidate": 0,
-        "False Positive": 0,
-        "False Negative": 0,
-        "True Positive": 0,
-    }
-
-    def count_centroids_in_raster(raster_path, label):
-        with rasterio.open(raster_path) as src:
-            raster_data = src.read(1)
-            transform = src.transform
-
-            for centroid in clipped_buildings["centroid"]:
-                row, col = src.index(centroid.x, centroid.y)
-                if 0 <= row < raster_data.shape[0] and 0 <= col < raster_data.shape[1]:
-                    pixel_value = raster_data[row, col]
-                    if label in ["Benchmark", "Candidate"]:
-                        if pixel_value == 2:  # False Positive
-                            centroid_counts[label] += 1
-                    else:
-                        if pixel_value == 2:
-                            centroid_counts["False Positive"] += 1
-                        elif pixel_value == 3:
-                            centroid_counts["False Negative"] += 1
-                        elif pixel_value == 4:
-                            centroid_counts["True Positive"] += 1
+        target_crs = src.crs
+
+    # Clipped building centroids, read once per case and reused by all candidates
+    xs, ys = building_centroids(
+        building_fp_path,
+        study_area_path,
+        target_crs,
+        os.path.join(save_dir, "BuildingFootprint"),
+    )
 
     if "bm" in str(raster1_path).lower():
-        count_centroids_in_raster(raster1_path, "Benchmark")
-        count_centroids_in_raster(raster2_path, "Candidate")
-        
+        labelled_rasters = {"Benchmark": raster1_path, "Candidate": raster2_path}
     elif "candidate" in str(raster2_path).lower():
-        count_centroids_in_raster(raster1_path, "Candidate")
-        count_centroids_in_raster(raster2_path, "Benchmark")
-
+        labelled_rasters = {"Candidate": raster1_path, "Benchmark": raster2_path}
+    else:
+        labelled_rasters = {}
     if "contingency" in str(contingency_map).lower():
-        count_centroids_in_raster(contingency_map, "Contingency")
-
-    total_buildings = len(clipped_buildings)
-    percentages = {
-        key: (count / total_buildings) * 100 if total_buildings > 0 else 0
-        for key, count in centroid_counts.items()
+        labelled_rasters["Contingency"] = contingency_map
+
+    # Class histograms of the pixels under the building centroids
+    histograms = dict(
+        zip(
+            labelled_rasters,
+            sample_class_histograms(
+                list(labelled_rasters.values()), xs, ys, windowed=windowed
+            ),
+        )
+    )
+    centroid_counts = building_counts_from_histograms(
+        histograms.get("Benchmark"),
+        histograms.get("Candidate"),
+        histograms.get("Contingency"),
+    )
+    save_building_counts(centroid_counts, len(xs), save_dir, basename)
+
+#Flooded building counts from the class histograms under the building centroids
+def building_counts_from_histograms(benchmark, candidate, contingency):
+    empty = np.zeros(256, dtype=np.int64)
+    benchmark = empty if benchmark is None else benchmark
+    candidate = empty if candidate is None else candidate
+    contingency = empty if contingency is None else contingency
+    return {
+        "Benchmark": int(benchmark[2]),
+        "Candidate": int(candidate[2]),
+        "False Positive": int(contingency[2]),
+        "False Negative": int(contingency[3]),
+        "True Positive": int(contingency[4]),
     }
 
+#CSI, FAR, POD and Building Deviation Ratio of the building counts
+def building_metrics(centroid_counts):
     TP = centroid_counts["True Positive"]
     FP = centroid_counts["False Positive"]
     FN = centroid_counts["False Negative"]
@@ -106,9 +241,25 @@ def GetFloodedBuildingCountInfo(
     CSI = TP / (TP + FP + FN) if (TP + FP + FN) > 0 else 0
     FAR = FP / (TP + FP) if (TP + FP) > 0 else 0
     POD = TP / (TP + FN) if (TP + FN) > 0 else 0
-    
-    
-    BDR = (centroid_counts["Candidate"]- centroid_counts["Benchmark"])/centroid_counts["Benchmark"]
+    BDR = (
+        (centroid_counts["Candidate"] - centroid_counts["Benchmark"]) / centroid_counts["Benchmark"]
+        if centroid_counts["Benchmark"] > 0
+        else 0
+    )
+    return CSI, FAR, POD, BDR
+
+#Save the building based metrics as CSV and bar plot
+def save_building_counts(centroid_counts, total_buildings, save_dir, basename, show=True):
+    # Plotly is only needed here, import it on first use
+    from plotly.subplots import make_subplots
+    import plotly.graph_objects as go
+
+    percentages = {
+        key: (count / total_buildings) * 100 if total_buildings > 0 else 0
+        for key, count in centroid_counts.items()
+    }
+
+    CSI, FAR, POD, BDR = building_metrics(centroid_counts)
 
     counts_data = {
         "Category": [
@@ -136,9 +287,9 @@ def GetFloodedBuildingCountInfo(
     }
 
     counts_df = pd.DataFrame(counts_data)
-    csv_file_path = os.path.join(
-        save_dir, "EvaluationMetrics", f"BuildingCounts_{basename}.csv"
-    )
+    metrics_dir = os.path.join(save_dir, "EvaluationMetrics")
+    os.makedirs(metrics_dir, exist_ok=True)
+    csv_file_path = os.path.join(metrics_dir, f"BuildingCounts_{basename}.csv")
     counts_df.to_csv(csv_file_path, index=False)
 
     third_raster_labels = ["False Positive", "False Negative", "True Positive"]
@@ -221,10 +372,11 @@ def GetFloodedBuildingCountInfo(
     output_path = os.path.join(plot_dir, f"BuildingCounts_{basename}.png")
     fig.write_image(output_path, scale=500 / 96, engine="kaleido")
     print(f"Performance metrics chart is saved as PNG at {output_path}")
-    fig.show()
+    if show:
+        fig.show()
 
 def process_TIFF(
-    tif_files, contingency_files, building_footprint, boundary, method_path
+    tif_files, contingency_files, building_footprint, boundary, method_path, windowed=True
 ):
     benchmark_path = None
     candidate_paths = []
@@ -257,6 +409,7 @@ def process_TIFF(
                     matching_contingency_map,
                     method_path,
                     candidate_base_name,
+                    windowed=windowed,
                 )
             else:
                 print(
@@ -289,6 +442,7 @@ def EvaluationWithBuildingFootprint(
     country=None,
     building_footprint=None,
     shapefile_dir=None,
+    windowed=True,
 ):
     tif_files_main = glob.glob(os.path.join(main_dir, "*.tif"))
     if tif_files_main:
@@ -335,6 +489,7 @@ def EvaluationWithBuildingFootprint(
                     building_footprintMS,
                     boundary,
                     method_path,
+                    windowed=windowed,
                 )
     else:
         for folder in os.listdir(main_dir):
@@ -387,4 +542,5 @@ def EvaluationWithBuildingFootprint(
                             building_footprintMS,
                             boundary,
                             method_path,
+                            windowed=windowed,
                         )
@@ -1,33 +1,87 @@
 #import Libraries
 import geopandas as gpd
-import boto3
-import botocore
 import os
+import functools
+import json
+import time
+import shutil
+import hashlib
 import tempfile
+from shapely.geometry import shape
+from shapely.ops import unary_union
 
-# Initialize an anonymous S3 client
-s3 = boto3.client(
-    's3',
-    config=botocore.config.Config(signature_version=botocore.UNSIGNED)
-)
+from ..utilis import read_features_around
+
+# Anonymous S3 client created on first use, FIMEVAL_S3_ENDPOINT points it to a local S3 stand-in
+@functools.lru_cache(maxsize=None)
+def get_s3_client():
+    import boto3
+    import botocore
+
+    return boto3.client(
+        's3',
+        endpoint_url=os.environ.get("FIMEVAL_S3_ENDPOINT"),
+        config=botocore.config.Config(signature_version=botocore.UNSIGNED)
+    )
+
+# Keep `PWBs3.s3` working without creating the client at import time
+def __getattr__(name):
+    if name == "s3":
+        return get_s3_client()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 bucket_name = 'sdmlab'
-pwb_folder = "PWB/"  
+pwb_folder = "PWB/"
+
+# Shapefile components making up the PWB layer
+PWB_EXTENSIONS = ('.shp', '.shx', '.dbf', '.prj', '.cpg')
+
+# Default upper bound of the on-disk PWB cache
+PWB_CACHE_MAX_BYTES = 2 * 1024**3
+
+def get_cache_dir(cache_dir=None):
+    """Root of the persistent PWB cache (FIMEVAL_CACHE_DIR or ~/.cache/fimeval/PWB)."""
+    if cache_dir is None:
+        cache_dir = os.environ.get("FIMEVAL_CACHE_DIR") or os.path.join(
+            os.path.expanduser("~"), ".cache", "fimeval"
+        )
+        cache_dir = os.path.join(cache_dir, "PWB")
+    os.makedirs(cache_dir, exist_ok=True)
+    return cache_dir
 
-def PWB_inS3(s3_client, bucket, prefix):
-    """Download all components of a shapefile from S3 into a temporary directory."""
-    tmp_dir = tempfile.mkdtemp()
+def is_offline(offline=None):
+    if offline is None:
+        offline = os.environ.get("FIMEVAL_OFFLINE", "").lower() in ("1", "true", "yes")
+    return offline
+
+def PWB_objects(s3_client, bucket, prefix):
+    """List the shapefile components of the PWB layer in the S3 folder."""
     response = s3_client.list_objects_v2(Bucket=bucket, Prefix=prefix)
     if 'Contents' not in response:
         raise ValueError("No files found in the specified S3 folder.")
-    
-    for obj in response['Contents']:
+    return [
+        obj for obj in response['Contents']
+        if os.path.basename(obj['Key']).endswith(PWB_EXTENSIONS)
+    ]
+
+def PWB_version(objects):
+    """Version of the PWB layer derived from the ETag and LastModified of its components."""
+    digest = hashlib.sha1()
+    for obj in sorted(objects, key=lambda obj: obj['Key']):
+        digest.update(obj['Key'].encode())
+        digest.update(str(obj.get('ETag', '')).encode())
+        digest.update(str(obj.get('LastModified', '')).encode())
+    return digest.hexdigest()[:16]
+
+def PWB_inS3(s3_client, bucket, prefix, download_dir=None):
+    """Download all components of a shapefile from S3 into a (temporary) directory."""
+    tmp_dir = download_dir or tempfile.mkdtemp()
+    for obj in PWB_objects(s3_client, bucket, prefix):
         file_key = obj['Key']
-        file_name = os.path.basename(file_key) 
-        if file_name.endswith(('.shp', '.shx', '.dbf', '.prj', '.cpg')):
-            local_path = os.path.join(tmp_dir, file_name)
-            s3_client.download_file(bucket, file_key, local_path)
-            
+        file_name = os.path.basename(file_key)
+        local_path = os.path.join(tmp_dir, file_name)
+        s3_client.download_file(bucket, file_key, local_path)
+
     shp_files = [f for f in os.listdir(tmp_dir) if f.endswith(".shp")]
     if not shp_files:
         raise ValueError("No .shp file found after download.")
@@ -35,7 +89,137 @@ def PWB_inS3(s3_client, bucket, prefix):
     shp_path = os.path.join(tmp_dir, shp_files[0])
     return shp_path
 
-def get_PWB():
-    shp_path = PWB_inS3(s3, bucket_name, pwb_folder)
-    pwb = gpd.read_file(shp_path)
-    return pwb
\ No newline at end of file
+def cached_versions(cache_dir):
+    """Complete cached PWB versions, most recently used first."""
+    versions = []
+    for version in os.listdir(cache_dir):
+        meta_path = os.path.join(cache_dir, version, "meta.json")
+        if os.path.exists(meta_path):
+            with open(meta_path) as f:
+                versions.append(json.load(f))
+    return sorted(versions, key=lambda meta: meta["last_used"], reverse=True)
+
+def touch_version(cache_dir, meta):
+    meta["last_used"] = time.time()
+    with open(os.path.join(cache_dir, meta["version"], "meta.json"), "w") as f:
+        json.dump(meta, f)
+
+def evict_PWB_cache(cache_dir, max_bytes, keep=None):
+    """Drop the least recently used PWB versions until the cache fits in max_bytes."""
+    versions = cached_versions(cache_dir)
+    total = sum(meta["size"] for meta in versions)
+    for meta in reversed(versions):
+        if total <= max_bytes:
+            break
+        if meta["version"] == keep:
+            continue
+        shutil.rmtree(os.path.join(cache_dir, meta["version"]), ignore_errors=True)
+        total -= meta["size"]
+
+def cache_PWB(s3_client, bucket, prefix, cache_dir, version):
+    """Download the PWB shapefile once and store it as an indexed GeoPackage."""
+    staging_dir = tempfile.mkdtemp(dir=cache_dir, prefix=".staging-")
+    try:
+        shp_path = PWB_inS3(s3_client, bucket, prefix, staging_dir)
+        pwb = gpd.read_file(shp_path)
+        version_dir = os.path.join(staging_dir, version)
+        os.makedirs(version_dir)
+        gpkg_path = os.path.join(version_dir, "PWB.gpkg")
+        pwb.to_file(gpkg_path, driver="GPKG", layer="PWB")
+        meta = {
+            "version": version,
+            "path": "PWB.gpkg",
+            "size": os.path.getsize(gpkg_path),
+            "last_used": time.time(),
+        }
+        with open(os.path.join(version_dir, "meta.json"), "w") as f:
+            json.dump(meta, f)
+        # Publish the version atomically so concurrent runs never see a partial cache
+        try:
+            os.rename(version_dir, os.path.join(cache_dir, version))
+        except OSError:
+            pass
+        return meta
+    finally:
+        shutil.rmtree(staging_dir, ignore_errors=True)
+
+def get_PWB_path(cache_dir=None, offline=None, max_cache_bytes=PWB_CACHE_MAX_BYTES, s3_client=None):
+    """
+    Get the path of the cached permanent water bodies GeoPackage.
+    The cached version is validated against the S3 object ETags, a new version is
+    downloaded only when the bucket changes, and offline mode (offline=True or
+    FIMEVAL_OFFLINE=1) uses the most recently used cached version without S3.
+    """
+    cache_dir = get_cache_dir(cache_dir)
+    s3_client = s3_client or get_s3_client()
+    meta = None
+
+    if not is_offline(offline):
+        from botocore.exceptions import BotoCoreError, ClientError
+
+        try:
+            version = PWB_version(PWB_objects(s3_client, bucket_name, pwb_folder))
+        except (BotoCoreError, ClientError) as e:
+            print(f"Could not reach the PWB bucket ({e}), using the cached PWB.")
+        else:
+            meta_path = os.path.join(cache_dir, version, "meta.json")
+            if os.path.exists(meta_path):
+                with open(meta_path) as f:
+                    meta = json.load(f)
+            else:
+                print("Downloading the permanent water bodies into the local cache...")
+                meta = cache_PWB(s3_client, bucket_name, pwb_folder, cache_dir, version)
+
+    if meta is None:
+        versions = cached_versions(cache_dir)
+        if not versions:
+            raise FileNotFoundError(
+                f"No cached permanent water bodies found in {cache_dir}. Run once with network access or pass PWB_dir."
+            )
+        meta = versions[0]
+
+    touch_version(cache_dir, meta)
+    evict_PWB_cache(cache_dir, max_cache_bytes, keep=meta["version"])
+    return os.path.join(cache_dir, meta["version"], meta["path"])
+
+def get_PWB(cache_dir=None, offline=None, max_cache_bytes=PWB_CACHE_MAX_BYTES, s3_client=None):
+    """Load the whole permanent water bodies layer through the local cache."""
+    pwb_path = get_PWB_path(cache_dir, offline, max_cache_bytes, s3_client)
+    pwb = gpd.read_file(pwb_path)
+    pwb.attrs["pwb_version"] = os.path.basename(os.path.dirname(pwb_path))
+    return pwb
+
+def clip_PWB(pwb, bounding_geom, crs):
+    """
+    PWB geometries intersecting the evaluation boundary, reprojected to crs.
+    pwb is either a GeoDataFrame or a vector file path; files are read with a
+    bbox filter so only the features around the case are loaded.
+    """
+    boundary = gpd.GeoSeries(
+        [unary_union([shape(geom) if isinstance(geom, dict) else geom for geom in bounding_geom])],
+        crs=crs,
+    )
+    pwb, boundary = read_features_around(pwb, boundary)
+    idx = pwb.sindex.query(boundary.iloc[0], predicate="intersects")
+    pwb = pwb.iloc[idx].to_crs(crs)
+    return list(pwb.geometry)
+
+def PWB_source_version(pwb):
+    """Version tag of a PWB source, used to key the rasterized PWB masks."""
+    if isinstance(pwb, gpd.GeoDataFrame):
+        if "pwb_version" in pwb.attrs:
+            return pwb.attrs["pwb_version"]
+        digest = hashlib.sha1(str(pwb.crs).encode())
+        for geom in pwb.geometry:
+            if geom is not None:
+                digest.update(geom.wkb)
+        return digest.hexdigest()[:16]
+    stat = os.stat(pwb)
+    key = f"{os.path.abspath(pwb)}:{stat.st_size}:{stat.st_mtime_ns}"
+    return hashlib.sha1(key.encode()).hexdigest()[:16]
+
+def PWB_mask_path(mask_dir, crs, transform, shape, pwb_version):
+    """Sidecar GeoTIFF of the PWB mask keyed by grid transform, CRS and PWB version."""
+    key = f"{tuple(transform)[:6]}:{shape}:{crs.to_wkt()}:{pwb_version}"
+    digest = hashlib.sha1(key.encode()).hexdigest()[:16]
+    return os.path.join(mask_dir, f"PWBMask_{digest}.tif")
@@ -1,6 +1,13 @@
-from .evaluationFIM import EvaluateFIM
-from .printcontingency import PrintContingencyMap
-from .plotevaluationmetrics import PlotEvaluationMetrics
-from .PWBs3 import get_PWB
+from ..lazyimports import lazy_attributes
 
-__all__ = ["EvaluateFIM", "PrintContingencyMap", "PlotEvaluationMetrics", "get_PWB"]
+# Entry points are imported on first use, see fimeval/__init__.py
+_LAZY_ATTRS = {
+    "EvaluateFIM": ".evaluationFIM",
+    "PrintContingencyMap": ".printcontingency",
+    "PlotEvaluationMetrics": ".plotevaluationmetrics",
+    "get_PWB": ".PWBs3",
+}
+
+__all__ = list(_LAZY_ATTRS)
+
+__getattr__, __dir__ = lazy_attributes(__name__, _LAZY_ATTRS)
@@ -1,4 +1,6 @@
 import os
+import time
+import traceback
 import numpy as np
 from pathlib import Path
 import geopandas as gpd
@@ -7,19 +9,51 @@ import shutil
 import subprocess
 import platform
 import pandas as pd
-from rasterio.warp import reproject, Resampling
-from rasterio.io import MemoryFile
+from datetime import datetime, timezone
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from rasterio import features
-from rasterio.mask import mask
+from rasterio.windows import transform as window_transform
+from rasterio.mask import raster_geometry_mask
+from shapely.geometry import shape
 
 import warnings
 
 warnings.filterwarnings("ignore", category=rasterio.errors.ShapeSkipWarning)
 
 from .methods import AOI, smallest_extent, convex_hull, get_smallest_raster_path
-from .metrics import evaluationmetrics
-from .PWBs3 import get_PWB
-from ..utilis import MakeFIMsUniform
+from .metrics import (
+    evaluationmetrics,
+    class_histogram,
+    metrics_from_counts,
+    counts_from_histogram,
+)
+from .streaming import evaluate_blockwise, candidate_vrt
+from .PWBs3 import get_PWB_path, clip_PWB, PWB_source_version, PWB_mask_path
+from .manifest import (
+    package_version,
+    geometry_digest,
+    fingerprint_inputs,
+    plan_incremental,
+    merge_metrics,
+    save_manifest,
+)
+from .resultcache import open_result_cache, result_key, restore_files
+from .resultsink import open_result_sink
+from ..utilis import (
+    MakeFIMsUniform,
+    release_harmonized,
+    class_raster_profile,
+    build_class_overviews,
+    CLASS_NODATA,
+    raster_metadata,
+)
+from ..BuildingFootprint.evaluationwithBF import (
+    building_centroids,
+    points_to_rowcol,
+    building_counts_from_histograms,
+    building_metrics,
+    save_building_counts,
+)
 
 #giving the permission to the folder
 def is_writable(path):
@@ -45,27 +79,92 @@ def fix_permissions(path):
         print(f"Shell script failed:\n{e.stderr}")
 
 
+#Persist the rasterized PWB mask so reruns on the same grid skip rasterization
+def write_pwb_mask(mask_path, pwb_mask, crs, transform):
+    profile = class_raster_profile(crs, transform, pwb_mask.shape[1], pwb_mask.shape[0])
+    tmp_path = f"{mask_path}.tmp"
+    with rasterio.open(tmp_path, "w", **profile) as dst:
+        dst.write(pwb_mask.astype(np.uint8), 1)
+    os.replace(tmp_path, mask_path)
+
+
+#Building centroids of the evaluation boundary as pixel positions on the clipped grid
+def building_points(building_footprint, bounding_geom, crs, transform, out_shape, save_dir):
+    study_area = gpd.GeoDataFrame(
+        geometry=[shape(geom) if isinstance(geom, dict) else geom for geom in bounding_geom],
+        crs=crs,
+    )
+    xs, ys = building_centroids(
+        building_footprint,
+        study_area,
+        crs,
+        os.path.join(save_dir, "BuildingFootprint"),
+    )
+    rows, cols, inside = points_to_rowcol(transform, out_shape, xs, ys)
+    return (rows[inside], cols[inside]), len(xs)
+
+
+
+#Metric values of one candidate, keyed like the rows of EvaluationMetrics.csv
+def metric_values(TN, FP, FN, TP):
+    TPR, FNR, Acc, Prec, sen, CSI, F1_score, POD, FPR, FAR = metrics_from_counts(
+        TN, FP, FN, TP
+    )
+    return {
+        "CSI_values": CSI,
+        "TN_values": TN,
+        "FP_values": FP,
+        "FN_values": FN,
+        "TP_values": TP,
+        "TPR_values": TPR,
+        "FNR_values": FNR,
+        "Acc_values": Acc,
+        "Prec_values": Prec,
+        "sen_values": sen,
+        "F1_values": F1_score,
+        "POD_values": POD,
+        "FPR_values": FPR,
+        "FAR_values": FAR,
+    }
+
+#Outputs of a candidate relative to the case output folder, as kept in the result cache
+def candidate_output_files(candidate_path, building_footprint=None):
+    name = os.path.splitext(os.path.basename(candidate_path))[0]
+    basename = os.path.basename(candidate_path).split(".")[0]
+    files = [
+        os.path.join("ContingencyMaps", f"ContingencyMAP_{name}.tif"),
+        os.path.join("MaskedFIMwithBoundary", f"{basename}_clipped.tif"),
+    ]
+    if building_footprint:
+        files += [
+            os.path.join("EvaluationMetrics", f"BuildingCounts_{basename}.csv"),
+            os.path.join("FinalPlots", f"BuildingCounts_{basename}.png"),
+        ]
+    return files
 # Function for the evalution of the model
 def evaluateFIM(
-    benchmark_path, candidate_paths, gdf, folder, method, output_dir, shapefile=None
+    benchmark_path,
+    candidate_paths,
+    gdf,
+    folder,
+    method,
+    output_dir,
+    shapefile=None,
+    streaming=False,
+    block_size=None,
+    candidate_workers=None,
+    cache_pwb_mask=False,
+    building_footprint=None,
+    catalog=None,
+    incremental=False,
+    result_cache=None,
+    result_rows=None,
 ):
-    # Lists to store evaluation metrics
-    csi_values = []
-    TN_values = []
-    FP_values = []
-    FN_values = []
-    TP_values = []
-    TPR_values = []
-    FNR_values = []
-    Acc_values = []
-    Prec_values = []
-    sen_values = []
-    F1_values = []
-    POD_values = []
-    FPR_values = []
-    Merged = []
-    Unique = []
-    FAR_values = []
+    case_start = time.perf_counter()
+    # (TN, FP, FN, TP) of every candidate by name, the metrics are derived from them
+    candidate_counts = {}
+    building_histograms = {}
+    candidate_seconds = {}
 
     # Dynamically call the specified method
     method = globals().get(method)
@@ -77,7 +176,10 @@ def evaluateFIM(
     os.makedirs(save_dir, exist_ok=True)
 
     # Get the smallest matched raster extent and make a boundary shapefile
-    smallest_raster_path = get_smallest_raster_path(benchmark_path, *candidate_paths)
+    # Boundary methods only need the raster headers, taken from the case catalog
+    smallest_raster_path = get_smallest_raster_path(
+        benchmark_path, *candidate_paths, catalog=catalog
+    )
 
     #If method is AOI, and direct shapefile directory is not provided, then it will search for the shapefile in the folder
     if method.__name__ == "AOI":
@@ -96,258 +198,323 @@ def evaluateFIM(
                     "No shapefile (.shp, .gpkg, .geojson, .kml) found in the folder and none provided. Either provide a shapefile directory or put shapefile inside folder directory."
                 )
         # Run AOI with the found or provided shapefile
-        bounding_geom = AOI(benchmark_path, shapefile, save_dir)
+        bounding_geom = AOI(benchmark_path, shapefile, save_dir, catalog=catalog)
+
+    elif method.__name__ == "smallest_extent":
+        print(f"--- {method.__name__} is processing ---")
+        bounding_geom = method(smallest_raster_path, save_dir=save_dir, catalog=catalog)
 
     else:
         print(f"--- {method.__name__} is processing ---")
         bounding_geom = method(smallest_raster_path, save_dir=save_dir)
 
-    # Read and process benchmark raster
-    with rasterio.open(benchmark_path) as src1:
-        out_image1, out_transform1 = mask(
-            src1, bounding_geom, crop=True, all_touched=True
+    # Only evaluate the candidates that changed since the manifest was written
+    all_candidate_names = [
+        os.path.splitext(os.path.basename(path))[0] for path in candidate_paths
+    ]
+    manifest = existing_metrics = None
+    cache = open_result_cache(result_cache)
+    if incremental or cache is not None:
+        context = {
+            "fimeval_version": package_version(),
+            "method": method.__name__,
+            "boundary": geometry_digest(bounding_geom),
+            "pwb_version": PWB_source_version(gdf),
+            "building_footprint": (
+                PWB_source_version(building_footprint) if building_footprint else None
+            ),
+        }
+    if incremental:
+        metrics_csv = os.path.join(save_dir, "EvaluationMetrics", "EvaluationMetrics.csv")
+        manifest, candidate_paths, existing_metrics = plan_incremental(
+            save_dir,
+            folder,
+            benchmark_path,
+            candidate_paths,
+            context,
+            metrics_csv,
+            catalog=catalog,
         )
-        benchmark_nodata = src1.nodata
-        benchmark_crs = src1.crs
-        b_profile = src1.profile
-        out_image1[out_image1 == benchmark_nodata] = 0
-        out_image1 = np.where(out_image1 > 0, 2, 0).astype(np.float32)
-        gdf = gdf.to_crs(benchmark_crs)
-        shapes1 = [
-            geom for geom in gdf.geometry if geom is not None and not geom.is_empty
+        if not candidate_paths:
+            print(f"--- {os.path.basename(folder)} is up to date, skipping evaluation ---")
+            # Keep the refreshed sizes and mtimes so the next run does not rehash
+            save_manifest(save_dir, manifest)
+            # Columns of candidates removed from the case are dropped from the CSV too
+            df = merge_metrics(existing_metrics, None, all_candidate_names)
+            df.to_csv(metrics_csv, index=False)
+            return df.set_index("Metrics").T.to_dict("list")
+        print(f"--- Evaluating {len(candidate_paths)} new or modified candidate(s) ---")
+
+    benchmark_basename = os.path.basename(benchmark_path).split(".")[0]
+    clipped_dir = os.path.join(save_dir, "MaskedFIMwithBoundary")
+    os.makedirs(clipped_dir, exist_ok=True)
+    contigency_dir = os.path.join(save_dir, "ContingencyMaps")
+    os.makedirs(contigency_dir, exist_ok=True)
+    pwb_mask_dir = os.path.join(save_dir, "PWBMask")
+    if cache_pwb_mask:
+        os.makedirs(pwb_mask_dir, exist_ok=True)
+
+    # Restore the candidates evaluated before on the same inputs, in any output folder
+    pending_names = [
+        os.path.splitext(os.path.basename(path))[0] for path in candidate_paths
+    ]
+    cached_counts = {}
+    building_counts = {}
+    benchmark_restored = False
+    if cache is not None:
+        if manifest is not None:
+            benchmark_entry = manifest["context"]["benchmark"]
+            candidate_entries = manifest["candidates"]
+        else:
+            benchmark_entry, candidate_entries, _ = fingerprint_inputs(
+                folder, benchmark_path, candidate_paths, catalog
+            )
+        # The output files are named after the FIMs, so the names are part of the keys
+        benchmark_key = result_key(context, benchmark_basename, benchmark_entry)
+        candidate_keys = {
+            name: result_key(context, benchmark_entry, name, entry)
+            for name, entry in candidate_entries.items()
+        }
+        missed = []
+        for path, name in zip(candidate_paths, pending_names):
+            cached = cache.get(candidate_keys[name])
+            if cached is None:
+                missed.append(path)
+                continue
+            try:
+                restore_files(cached[1], save_dir)
+            except OSError:
+                missed.append(path)
+                continue
+            cached_counts[name] = cached[0]["counts"]
+            if "building_counts" in cached[0]:
+                building_counts[name] = cached[0]["building_counts"]
+        cached = cache.get(benchmark_key) if not missed else None
+        if cached is not None:
+            try:
+                restore_files(cached[1], save_dir)
+                benchmark_restored = True
+            except OSError:
+                pass
+        candidate_paths = missed
+        if cached_counts:
+            print(f"--- {len(cached_counts)} candidate(s) restored from the result cache ---")
+
+    if benchmark_restored:
+        print(f"--- {os.path.basename(folder)} fully restored from the result cache ---")
+
+    elif streaming:
+        # Walk the benchmark and candidates window by window
+        benchmark_meta = raster_metadata(benchmark_path, catalog)
+        benchmark_crs = benchmark_meta.crs
+        clip_window = features.geometry_window(benchmark_meta, bounding_geom)
+        out_transform1 = window_transform(clip_window, benchmark_meta.transform)
+        mask_path = None
+        if cache_pwb_mask:
+            mask_path = PWB_mask_path(
+                pwb_mask_dir,
+                benchmark_crs,
+                out_transform1,
+                (int(clip_window.height), int(clip_window.width)),
+                PWB_source_version(gdf),
+            )
+        if mask_path and os.path.exists(mask_path):
+            shapes1 = []
+        else:
+            shapes1 = clip_PWB(gdf, bounding_geom, benchmark_crs)
+        candidate_basenames = [
+            os.path.basename(path).split(".")[0] for path in candidate_paths
         ]
-        mask1 = features.geometry_mask(
+        clipped_paths = [
+            os.path.join(clipped_dir, f"{name}_clipped.tif")
+            for name in [benchmark_basename] + candidate_basenames
+        ]
+        contingency_paths = [
+            os.path.join(
+                contigency_dir,
+                f"ContingencyMAP_{os.path.splitext(os.path.basename(path))[0]}.tif",
+            )
+            for path in candidate_paths
+        ]
+        points = None
+        if building_footprint:
+            points, total_buildings = building_points(
+                building_footprint,
+                bounding_geom,
+                benchmark_crs,
+                out_transform1,
+                (int(clip_window.height), int(clip_window.width)),
+                save_dir,
+            )
+        histograms, point_histograms = evaluate_blockwise(
+            benchmark_path,
+            candidate_paths,
             shapes1,
-            transform=out_transform1,
-            invert=True,
-            out_shape=out_image1.shape[1:],
+            bounding_geom,
+            clipped_paths,
+            contingency_paths,
+            block_size=block_size,
+            pwb_mask_path=mask_path,
+            points=points,
         )
-        extract_b = np.where(mask1, out_image1, 0)
-        extract_b = np.where(extract_b > 0, 1, 0)
-        idx_pwb = np.where(extract_b == 1)
-        out_image1[idx_pwb] = 0
+        if point_histograms is not None:
+            building_histograms = dict(zip(candidate_basenames, point_histograms))
+        # Overviews let the contingency maps be rendered without a full read
+        for contingency_path in contingency_paths:
+            build_class_overviews(contingency_path)
+        for path, histogram in zip(candidate_paths, histograms):
+            name = os.path.splitext(os.path.basename(path))[0]
+            candidate_counts[name] = counts_from_histogram(histogram)
 
-        benchmark_basename = os.path.basename(benchmark_path).split(".")[0]
-        clipped_dir = os.path.join(save_dir, "MaskedFIMwithBoundary")
-        if not os.path.exists(clipped_dir):
-            os.makedirs(clipped_dir)
+    else:
+        # Read and process benchmark raster as compact uint8 class codes
+        with rasterio.open(benchmark_path) as src1:
+            outside1, out_transform1, window1 = raster_geometry_mask(
+                src1, bounding_geom, crop=True, all_touched=True
+            )
+            benchmark = src1.read(1, window=window1)
+            benchmark_nodata = src1.nodata
+            benchmark_crs = src1.crs
+            wet = benchmark > 0
+            if benchmark_nodata is not None:
+                wet &= benchmark != benchmark_nodata
+            out_image1 = np.where(wet & ~outside1, 2, 0).astype(np.uint8)
+            del benchmark, wet
+
+            # Rasterize the PWB once on the benchmark grid, it is reused for every candidate
+            mask_path = None
+            if cache_pwb_mask:
+                mask_path = PWB_mask_path(
+                    pwb_mask_dir,
+                    benchmark_crs,
+                    out_transform1,
+                    out_image1.shape,
+                    PWB_source_version(gdf),
+                )
+            if mask_path and os.path.exists(mask_path):
+                with rasterio.open(mask_path) as src:
+                    mask1 = src.read(1) == 1
+            else:
+                shapes1 = clip_PWB(gdf, bounding_geom, benchmark_crs)
+                if shapes1:
+                    mask1 = features.geometry_mask(
+                        shapes1,
+                        transform=out_transform1,
+                        invert=True,
+                        out_shape=out_image1.shape,
+                    )
+                else:
+                    mask1 = np.zeros(out_image1.shape, dtype=bool)
+                if mask_path:
+                    write_pwb_mask(mask_path, mask1, benchmark_crs, out_transform1)
+            out_image1[mask1] = 0
 
-        clipped_benchmark = os.path.join(
-            clipped_dir, f"{benchmark_basename}_clipped.tif"
-        )
-        b_profile.update(
-            {
-                "height": out_image1.shape[1],
-                "width": out_image1.shape[2],
-                "transform": out_transform1,
-            }
-        )
+            clipped_benchmark = os.path.join(
+                clipped_dir, f"{benchmark_basename}_clipped.tif"
+            )
+            b_profile = class_raster_profile(
+                benchmark_crs,
+                out_transform1,
+                out_image1.shape[1],
+                out_image1.shape[0],
+            )
+            with rasterio.open(clipped_benchmark, "w", **b_profile) as dst:
+                dst.write(np.where(outside1, CLASS_NODATA, out_image1), 1)
+
+        # Building centroids are sampled straight from the in-memory class arrays
+        points = None
+        if building_footprint:
+            points, total_buildings = building_points(
+                building_footprint,
+                bounding_geom,
+                benchmark_crs,
+                out_transform1,
+                out_image1.shape,
+                save_dir,
+            )
+            benchmark_hist = class_histogram(out_image1[points])
+
+        # Warp, clip and evaluate one candidate against the shared benchmark
+        def evaluate_candidate(candidate_path):
+            candidate_start = time.perf_counter()
+            base_name = os.path.splitext(os.path.basename(candidate_path))[0]
+            with rasterio.open(candidate_path) as src2:
+                # Single warp straight onto the clipped benchmark grid
+                height, width = out_image1.shape
+                with candidate_vrt(
+                    src2, benchmark_crs, out_transform1, width, height
+                ) as vrt:
+                    # Data and alpha bands in one read, so the candidate is warped once
+                    candidate, alpha = vrt.read([1, vrt.count])
+                    wet = candidate > 0
+                    if src2.nodata is not None:
+                        wet &= candidate != src2.nodata
+                    del candidate
+                    out_image2 = np.where(wet, 2, 1).astype(np.uint8)
+                    del wet
+                    out_image2[(alpha == 0) | outside1] = 0
+                    del alpha
+
+                # Save the clipped candidate raster
+                candidate_basename = os.path.basename(candidate_path).split(".")[0]
+                clipped_candidate = os.path.join(
+                    clipped_dir, f"{candidate_basename}_clipped.tif"
+                )
+                with rasterio.open(clipped_candidate, "w", **b_profile) as dst:
+                    dst.write(np.where(outside1, CLASS_NODATA, out_image2), 1)
 
-        with rasterio.open(clipped_benchmark, "w", **b_profile) as dst:
-            dst.write(np.squeeze(out_image1), 1)
-
-    def resize_image(
-        source_image,
-        source_transform,
-        source_crs,
-        target_crs,
-        target_shape,
-        target_transform,
-    ):
-        target_image = np.empty(target_shape, dtype=source_image.dtype)
-        reproject(
-            source=source_image,
-            destination=target_image,
-            src_transform=source_transform,
-            dst_transform=target_transform,
-            src_crs=source_crs,
-            dst_crs=target_crs,
-            resampling=Resampling.nearest,
-        )
-        return target_image
-
-    # Process each candidate file
-    for idx, candidate_path in enumerate(candidate_paths):
-        base_name = os.path.splitext(os.path.basename(candidate_path))[0]
-        with rasterio.open(candidate_path) as src2:
-            candidate = src2.read(1)
-            candidate_nodata = src2.nodata
-            candidate_transform = src2.transform
-            candidate_meta = src2.meta.copy()
-            candidate_crs = src2.crs
-            c_profile = src2.profile
-            candidate[candidate == src2.nodata] = 0
-            candidate = np.where(candidate > 0, 2, 1).astype(np.float32)
-            with MemoryFile() as memfile:
-                with memfile.open(**candidate_meta) as mem2:
-                    mem2.write(candidate, 1)
-                    dst_transform, width, height = (
-                        rasterio.warp.calculate_default_transform(
-                            mem2.crs,
-                            benchmark_crs,
-                            mem2.width,
-                            mem2.height,
-                            *mem2.bounds,
-                        )
-                    )
-                    dst_meta = mem2.meta.copy()
-                    dst_meta.update(
-                        {
-                            "crs": benchmark_crs,
-                            "transform": dst_transform,
-                            "width": width,
-                            "height": height,
-                        }
+                if points is not None:
+                    candidate_hist = class_histogram(out_image2[points])
+
+                out_image2[mask1 & (out_image2 > 0)] = 5
+
+                # Get the confusion counts
+                merged, counts = evaluationmetrics(out_image1, out_image2)
+
+                # Write the contingency map while the merged raster is in memory
+                output_filename = os.path.join(
+                    contigency_dir, f"ContingencyMAP_{base_name}.tif"
+                )
+                with rasterio.open(output_filename, "w", **b_profile) as dst:
+                    dst.write(np.where(outside1, CLASS_NODATA, merged), 1)
+                build_class_overviews(output_filename)
+
+                if points is not None:
+                    building_histograms[candidate_basename] = (
+                        benchmark_hist,
+                        candidate_hist,
+                        class_histogram(merged[points]),
                     )
 
-                    with MemoryFile() as memfile_reprojected:
-                        with memfile_reprojected.open(**dst_meta) as mem2_reprojected:
-                            for i in range(1, mem2.count + 1):
-                                reproject(
-                                    source=rasterio.band(mem2, i),
-                                    destination=rasterio.band(mem2_reprojected, i),
-                                    src_transform=mem2.transform,
-                                    src_crs=mem2.crs,
-                                    dst_transform=dst_transform,
-                                    dst_crs=benchmark_crs,
-                                    resampling=Resampling.nearest,
-                                )
-                            out_image2, out_transform2 = mask(
-                                mem2_reprojected,
-                                bounding_geom,
-                                crop=True,
-                                all_touched=True,
-                            )
-                            out_image2 = np.where(
-                                out_image2 == candidate_nodata, 0, out_image2
-                            )
-
-                            # Save the clipped candidate raster
-                            candidate_basename = os.path.basename(candidate_path).split(
-                                "."
-                            )[0]
-                            clipped_candidate = os.path.join(
-                                clipped_dir, f"{candidate_basename}_clipped.tif"
-                            )
-                            b_profile.update(
-                                {
-                                    "height": out_image1.shape[1],
-                                    "width": out_image1.shape[2],
-                                    "transform": out_transform1,
-                                }
-                            )
-                            with rasterio.open(
-                                clipped_candidate, "w", **b_profile
-                            ) as dst:
-                                dst.write(np.squeeze(out_image2), 1)
-
-                            mask2 = features.geometry_mask(
-                                shapes1,
-                                transform=out_transform2,
-                                invert=True,
-                                out_shape=(out_image2.shape[1], out_image2.shape[2]),
-                            )
-                            extract_c = np.where(mask2, out_image2, 0)
-                            extract_c = np.where(extract_c > 0, 1, 0)
-                            idx_pwc = np.where(extract_c == 1)
-                            out_image2[idx_pwc] = 5
-                            out_image2_resized = resize_image(
-                                out_image2,
-                                out_transform2,
-                                mem2_reprojected.crs,
-                                benchmark_crs,
-                                out_image1.shape,
-                                out_transform1,
-                            )
-                            merged = out_image1 + out_image2_resized
-
-            # Get Evaluation Metrics
-            (
-                unique_values,
-                TN,
-                FP,
-                FN,
-                TP,
-                TPR,
-                FNR,
-                Acc,
-                Prec,
-                sen,
-                CSI,
-                F1_score,
-                POD,
-                FPR,
-                merged,
-                FAR,
-            ) = evaluationmetrics(out_image1, out_image2_resized)
-
-            # Append values to the lists
-            csi_values.append(CSI)
-            TN_values.append(TN)
-            FP_values.append(FP)
-            FN_values.append(FN)
-            TP_values.append(TP)
-            TPR_values.append(TPR)
-            FNR_values.append(FNR)
-            Acc_values.append(Acc)
-            Prec_values.append(Prec)
-            sen_values.append(sen)
-            F1_values.append(F1_score)
-            POD_values.append(POD)
-            FPR_values.append(FPR)
-            Merged.append(merged)
-            Unique.append(unique_values)
-            FAR_values.append(FAR)
-
-    results = {
-        "CSI_values": csi_values,
-        "TN_values": TN_values,
-        "FP_values": FP_values,
-        "FN_values": FN_values,
-        "TP_values": TP_values,
-        "TPR_values": TPR_values,
-        "FNR_values": FNR_values,
-        "Acc_values": Acc_values,
-        "Prec_values": Prec_values,
-        "sen_values": sen_values,
-        "F1_values": F1_values,
-        "POD_values": POD_values,
-        "FPR_values": FPR_values,
-        # 'Merged': Merged,
-        #  'Unique': Unique
-        "FAR_values": FAR_values,
-    }
-    for candidate_idx, candidate_path in enumerate(candidate_paths):
-        candidate_BASENAME = os.path.splitext(os.path.basename(candidate_path))[0]
-        merged_raster = Merged[candidate_idx]
-        if merged_raster.ndim == 3:
-            band = merged_raster.squeeze()
-        elif merged_raster.ndim == 2:
-            band = merged_raster
+                candidate_seconds[base_name] = time.perf_counter() - candidate_start
+                return counts
+
+        # The benchmark is read-only, so candidates can be evaluated concurrently
+        if candidate_workers and candidate_workers > 1 and len(candidate_paths) > 1:
+            with ThreadPoolExecutor(max_workers=candidate_workers) as executor:
+                candidate_results = list(
+                    executor.map(evaluate_candidate, candidate_paths)
+                )
         else:
-            raise ValueError(
-                f"Unexpected number of dimensions in Merged[{candidate_idx}]."
-            )
+            candidate_results = [evaluate_candidate(path) for path in candidate_paths]
 
-        # Construct the contingency file name dynamically
-        contigency_dir = os.path.join(save_dir, "ContingencyMaps")
-        os.makedirs(contigency_dir, exist_ok=True)
-        output_filename = os.path.join(
-            contigency_dir, f"ContingencyMAP_{candidate_BASENAME}.tif"
-        )
-        with rasterio.open(output_filename, "w", **b_profile) as dst:
-            dst.write(band, 1)
-            dst.transform = out_transform1
-            dst.crs = benchmark_crs
+        for path, counts in zip(candidate_paths, candidate_results):
+            candidate_counts[os.path.splitext(os.path.basename(path))[0]] = counts
 
+    # Candidates restored from the result cache follow the evaluated ones
+    candidate_counts.update(cached_counts)
+    results = {metric: [] for metric in metric_values(0, 0, 0, 0)}
+    for counts in candidate_counts.values():
+        for metric, value in metric_values(*counts).items():
+            results[metric].append(value)
     # Saving it into dataframe
-    candidate_names = [
-        os.path.splitext(os.path.basename(path))[0] for path in candidate_paths
-    ]
     df = pd.DataFrame.from_dict(results, orient="index")
-    df.columns = candidate_names
+    df.columns = list(candidate_counts)
     df.reset_index(inplace=True)
     df.rename(columns={"index": "Metrics"}, inplace=True)
+    if incremental or cached_counts:
+        df = merge_metrics(existing_metrics, df, all_candidate_names)
+        results = df.set_index("Metrics").T.to_dict("list")
 
     # Save the DataFrame
     evaluationMetrics_DIR = os.path.join(save_dir, "EvaluationMetrics")
@@ -356,6 +523,72 @@ def evaluateFIM(
     csv_file = os.path.join(evaluationMetrics_DIR, "EvaluationMetrics.csv")
     df.to_csv(csv_file, index=False)
     print(f"Evaluation metrics saved to {csv_file}")
+
+    # Building based metrics, from the centroids sampled during the evaluation
+    for candidate_basename, histograms in building_histograms.items():
+        building_counts[candidate_basename] = building_counts_from_histograms(*histograms)
+        save_building_counts(
+            building_counts[candidate_basename],
+            total_buildings,
+            save_dir,
+            candidate_basename,
+            show=False,
+        )
+    if cache is not None:
+        for path in candidate_paths:
+            name = os.path.splitext(os.path.basename(path))[0]
+            result = {"counts": [int(count) for count in candidate_counts[name]]}
+            if name in building_counts:
+                result["building_counts"] = building_counts[name]
+            cache.put(
+                candidate_keys[name],
+                result,
+                {
+                    output: os.path.join(save_dir, output)
+                    for output in candidate_output_files(path, building_footprint)
+                },
+            )
+        clipped_benchmark = os.path.join(
+            "MaskedFIMwithBoundary", f"{benchmark_basename}_clipped.tif"
+        )
+        cache.put(
+            benchmark_key, {}, {clipped_benchmark: os.path.join(save_dir, clipped_benchmark)}
+        )
+    if manifest is not None:
+        save_manifest(save_dir, manifest)
+
+    # Tidy rows of the candidates evaluated or restored in this run
+    if result_rows is not None:
+        case_seconds = time.perf_counter() - case_start
+        evaluated_at = datetime.now(timezone.utc).isoformat()
+        for name in pending_names:
+            counts = [int(count) for count in candidate_counts[name]]
+            row = {
+                "case_name": os.path.basename(folder),
+                "benchmark": os.path.splitext(os.path.basename(benchmark_path))[0],
+                "candidate": name,
+                "method": method.__name__,
+                "output_dir": save_dir,
+                "cached": name in cached_counts,
+                "case_seconds": case_seconds,
+                "candidate_seconds": candidate_seconds.get(name),
+                "evaluated_at": evaluated_at,
+            }
+            for metric, value in metric_values(*counts).items():
+                row[metric.rsplit("_", 1)[0]] = value
+            # Building based metrics, left empty when no building footprint was evaluated
+            if name in building_counts:
+                centroid_counts = building_counts[name]
+                row["building_TP"] = centroid_counts["True Positive"]
+                row["building_FP"] = centroid_counts["False Positive"]
+                row["building_FN"] = centroid_counts["False Negative"]
+                (
+                    row["building_CSI"],
+                    row["building_FAR"],
+                    row["building_POD"],
+                    row["building_BDR"],
+                ) = building_metrics(centroid_counts)
+            result_rows.append(row)
     return results
 
 #Safely deleting the folder
@@ -370,79 +603,264 @@ def safe_delete_folder(folder_path):
     except Exception as e:
         print(f"Error deleting {folder_path}: {e}")
 
-def EvaluateFIM(main_dir, method_name, output_dir, PWB_dir=None, shapefile_dir=None, target_crs=None, target_resolution=None):
+#Split the harmonized FIMs of a case into benchmark and candidates and evaluate them
+def process_TIFF(
+    tif_files,
+    folder_dir,
+    gdf,
+    method_name,
+    output_dir,
+    shapefile_dir=None,
+    streaming=False,
+    block_size=None,
+    candidate_workers=None,
+    cache_pwb_mask=False,
+    building_footprint=None,
+    catalog=None,
+    incremental=False,
+    result_cache=None,
+    result_rows=None,
+):
+    benchmark_path = None
+    candidate_path = []
+
+    if len(tif_files) == 2:
+        for tif_file in tif_files:
+            if "benchmark" in tif_file.name.lower() or "BM" in tif_file.name:
+                benchmark_path = tif_file
+            else:
+                candidate_path.append(tif_file)
+
+    elif len(tif_files) > 2:
+        for tif_file in tif_files:
+            if "benchmark" in tif_file.name.lower() or "BM" in tif_file.name:
+                benchmark_path = tif_file
+                print(f"---Benchmark: {tif_file.name}---")
+            else:
+                candidate_path.append(tif_file)
+
+    if benchmark_path and candidate_path:
+        print(f"---Flood Inundation Evaluation of {folder_dir.name}---")
+        Metrics = evaluateFIM(
+            benchmark_path,
+            candidate_path,
+            gdf,
+            folder_dir,
+            method_name,
+            output_dir,
+            shapefile_dir,
+            streaming=streaming,
+            block_size=block_size,
+            candidate_workers=candidate_workers,
+            cache_pwb_mask=cache_pwb_mask,
+            building_footprint=building_footprint,
+            catalog=catalog,
+            incremental=incremental,
+            result_cache=result_cache,
+            result_rows=result_rows,
+        )
+        print("\n", Metrics, "\n")
+        return Metrics
+    else:
+        print(
+            f"Skipping {folder_dir.name} as it doesn't have a valid benchmark and candidate configuration."
+        )
+        return None
+
+#Harmonize, evaluate and clean up a single case folder
+def evaluate_case(
+    folder_dir,
+    gdf,
+    method_name,
+    output_dir,
+    shapefile_dir=None,
+    target_crs=None,
+    target_resolution=None,
+    streaming=False,
+    block_size=None,
+    candidate_workers=None,
+    cache_pwb_mask=False,
+    keep_harmonized=False,
+    building_footprint=None,
+    incremental=False,
+    result_cache=None,
+    result_rows=None,
+):
+    folder_dir = Path(folder_dir)
+    # Harmonized FIMs are in-memory GTiffs unless they are kept in the processing folder,
+    # their headers are catalogued once and shared with the evaluation
+    catalog = {}
+    TIFFfiles = MakeFIMsUniform(
+        folder_dir,
+        target_crs=target_crs,
+        target_resolution=target_resolution,
+        virtual=not keep_harmonized,
+        catalog=catalog,
+    ) or []
+    try:
+        return process_TIFF(
+            TIFFfiles,
+            folder_dir,
+            gdf,
+            method_name,
+            output_dir,
+            shapefile_dir,
+            streaming=streaming,
+            block_size=block_size,
+            candidate_workers=candidate_workers,
+            cache_pwb_mask=cache_pwb_mask,
+            building_footprint=building_footprint,
+            catalog=catalog,
+            incremental=incremental,
+            result_cache=result_cache,
+            result_rows=result_rows,
+        )
+    finally:
+        release_harmonized(TIFFfiles)
+
+#PWB layer shared by the case workers, set once per worker process
+_worker_gdf = None
+
+def _init_case_worker(gdf):
+    global _worker_gdf
+    _worker_gdf = gdf
+
+#Result rows travel back with the metrics, the parent process owns the results sink
+def _evaluate_case_worker(folder_dir, case_kwargs):
+    rows = []
+    Metrics = evaluate_case(folder_dir, _worker_gdf, result_rows=rows, **case_kwargs)
+    return Metrics, rows
+
+#Case folder names by outcome, failed cases keep their error message and traceback
+def new_case_summary():
+    return {"succeeded": [], "skipped": [], "failed": {}, "tracebacks": {}}
+
+#Record the exception being handled, with its traceback (including a worker's) for debugging
+def record_case_failure(summary, name, error):
+    summary["failed"][name] = f"{type(error).__name__}: {error}"
+    summary["tracebacks"][name] = traceback.format_exc()
+
+def print_case_summary(summary):
+    print(
+        f"--- {len(summary['succeeded'])} case(s) evaluated, "
+        f"{len(summary['skipped'])} skipped, {len(summary['failed'])} failed ---"
+    )
+    for name, error in summary["failed"].items():
+        print(f"Failed {name}: {error}")
+        print(summary["tracebacks"][name])
+
+#Fan the case folders out to a process pool, a failing case does not stop the others
+def evaluate_cases_parallel(case_folders, gdf, workers, case_kwargs, sink=None):
+    summary = new_case_summary()
+    with ProcessPoolExecutor(
+        max_workers=min(workers, len(case_folders)),
+        initializer=_init_case_worker,
+        initargs=(gdf,),
+    ) as executor:
+        futures = [
+            executor.submit(_evaluate_case_worker, folder, case_kwargs)
+            for folder in case_folders
+        ]
+        for folder, future in zip(case_folders, futures):
+            try:
+                Metrics, rows = future.result()
+            except Exception as e:
+                record_case_failure(summary, folder.name, e)
+                continue
+            if sink is not None:
+                sink.write(rows)
+            if Metrics is None:
+                summary["skipped"].append(folder.name)
+            else:
+                summary["succeeded"].append(folder.name)
+    print_case_summary(summary)
+    return summary
+
+def EvaluateFIM(
+    main_dir,
+    method_name,
+    output_dir,
+    PWB_dir=None,
+    shapefile_dir=None,
+    target_crs=None,
+    target_resolution=None,
+    streaming=False,
+    block_size=None,
+    workers=None,
+    candidate_workers=None,
+    cache_pwb_mask=False,
+    keep_harmonized=False,
+    building_footprint=None,
+    incremental=False,
+    result_cache=None,
+    results_sink=None,
+):
     main_dir = Path(main_dir)
-    # Read the permanent water bodies
+    # Permanent water bodies are read per case, only around the evaluation extent
     if PWB_dir is None:
-        gdf = get_PWB()
+        gdf = get_PWB_path()
     else:
-        gdf = gpd.read_file(PWB_dir)
+        gdf = str(PWB_dir)
     
     #Grant the permission to the main directory
     print(f"Fixing permissions for {main_dir}...")
     fix_permissions(main_dir)
 
-    #runt the process
-    def process_TIFF(tif_files, folder_dir):
-        benchmark_path = None
-        candidate_path = []
-
-        if len(tif_files) == 2:
-            for tif_file in tif_files:
-                if "benchmark" in tif_file.name.lower() or "BM" in tif_file.name:
-                    benchmark_path = tif_file
-                else:
-                    candidate_path.append(tif_file)
-
-        elif len(tif_files) > 2:
-            for tif_file in tif_files:
-                if "benchmark" in tif_file.name.lower() or "BM" in tif_file.name:
-                    benchmark_path = tif_file
-                    print(f"---Benchmark: {tif_file.name}---")
-                else:
-                    candidate_path.append(tif_file)
-
-        if benchmark_path and candidate_path:
-            print(f"---Flood Inundation Evaluation of {folder_dir.name}---")
-            Metrics = evaluateFIM(
-                benchmark_path,
-                candidate_path,
-                gdf,
-                folder_dir,
-                method_name,
-                output_dir,
-                shapefile_dir,
-            )
-            print("\n", Metrics, "\n")
-        else:
-            print(
-                f"Skipping {folder_dir.name} as it doesn't have a valid benchmark and candidate configuration."
-            )
+    case_kwargs = {
+        "method_name": method_name,
+        "output_dir": output_dir,
+        "shapefile_dir": shapefile_dir,
+        "target_crs": target_crs,
+        "target_resolution": target_resolution,
+        "streaming": streaming,
+        "block_size": block_size,
+        "candidate_workers": candidate_workers,
+        "cache_pwb_mask": cache_pwb_mask,
+        "keep_harmonized": keep_harmonized,
+        "building_footprint": building_footprint,
+        "incremental": incremental,
+        "result_cache": result_cache,
+    }
 
     # Check if main_dir directly contains tif files
     TIFFfiles_main_dir = list(main_dir.glob("*.tif"))
     if TIFFfiles_main_dir:
-        MakeFIMsUniform(main_dir, target_crs=target_crs, target_resolution=target_resolution)
-
-        # processing folder
-        processing_folder = main_dir / "processing"
-        TIFFfiles = list(processing_folder.glob("*.tif"))
-
-        process_TIFF(TIFFfiles, main_dir)
-        safe_delete_folder(processing_folder)
+        case_folders = [main_dir]
     else:
-        for folder in main_dir.iterdir():
+        case_folders = []
+        for folder in sorted(main_dir.iterdir()):
             if folder.is_dir():
-                tif_files = list(folder.glob("*.tif"))
-                
-                if tif_files:
-                    MakeFIMsUniform(folder, target_crs=target_crs, target_resolution=target_resolution)
-                    
-                    processing_folder = folder / "processing"
-                    TIFFfiles = list(processing_folder.glob("*.tif"))
-
-                    process_TIFF(TIFFfiles, folder)
-                    safe_delete_folder(processing_folder)
+                if list(folder.glob("*.tif")):
+                    case_folders.append(folder)
                 else:
                     print(f"Skipping {folder.name} as it doesn't contain any tif files.")
 
+    # Tidy rows of every evaluated candidate are appended to the results sink in batches
+    sink = open_result_sink(results_sink)
+    try:
+        if workers and workers > 1 and len(case_folders) > 1:
+            return evaluate_cases_parallel(case_folders, gdf, workers, case_kwargs, sink)
+
+        summary = new_case_summary()
+        for folder in case_folders:
+            rows = [] if sink is not None else None
+            # A failing case is reported in the summary, as with a process pool
+            try:
+                Metrics = evaluate_case(folder, gdf, result_rows=rows, **case_kwargs)
+            except Exception as e:
+                record_case_failure(summary, folder.name, e)
+                continue
+            if sink is not None:
+                sink.write(rows)
+            if Metrics is None:
+                summary["skipped"].append(folder.name)
+            else:
+                summary["succeeded"].append(folder.name)
+        print_case_summary(summary)
+        return summary
+    finally:
+        # A sink passed in by the caller stays open for further runs
+        if sink is not None and sink is results_sink:
+            sink.flush()
+        elif sink is not None:
+            sink.close()
@@ -0,0 +1,153 @@
+import os
+import json
+import hashlib
+import pandas as pd
+from pathlib import Path
+from importlib import metadata
+from shapely.geometry import shape
+
+from ..utilis import raster_metadata
+
+# Manifest written next to the outputs of an incremental evaluation
+MANIFEST_NAME = "EvaluationManifest.json"
+HASH_CHUNK_SIZE = 1 << 20
+
+
+def package_version():
+    try:
+        return metadata.version("fimeval")
+    except metadata.PackageNotFoundError:
+        return "unknown"
+
+
+# Content hash of a file, the previous hash is reused when size and mtime match
+def file_fingerprint(path, previous=None):
+    stat = os.stat(path)
+    if (
+        previous
+        and previous.get("size") == stat.st_size
+        and previous.get("mtime_ns") == stat.st_mtime_ns
+    ):
+        return previous
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return {
+        "size": stat.st_size,
+        "mtime_ns": stat.st_mtime_ns,
+        "sha256": digest.hexdigest(),
+    }
+
+
+# Source FIM of a harmonized path, MakeFIMsUniform keeps the file stem
+def source_fim_path(folder, path):
+    return Path(folder) / f"{Path(path).stem}.tif"
+
+
+# Grid a FIM is evaluated on after harmonization (target CRS and resolution)
+def grid_signature(meta):
+    return {
+        "crs": meta.crs.to_wkt() if meta.crs else None,
+        "transform": list(meta.transform)[:6],
+        "shape": [meta.height, meta.width],
+    }
+
+
+def geometry_digest(geometries):
+    digest = hashlib.sha256()
+    for geom in geometries:
+        digest.update(shape(geom).wkb)
+    return digest.hexdigest()
+
+
+def load_manifest(save_dir):
+    try:
+        with open(os.path.join(save_dir, MANIFEST_NAME)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def save_manifest(save_dir, manifest):
+    manifest_path = os.path.join(save_dir, MANIFEST_NAME)
+    tmp_path = f"{manifest_path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_path, manifest_path)
+
+
+# Content hash and harmonized grid of the benchmark and of each candidate (by name)
+def fingerprint_inputs(
+    folder, benchmark_path, candidate_paths, catalog=None, previous_files=None
+):
+    previous_files = previous_files or {}
+    files = {}
+
+    def entry(path):
+        source = str(source_fim_path(folder, path))
+        fingerprint = file_fingerprint(source, previous_files.get(source))
+        files[source] = fingerprint
+        return {
+            "sha256": fingerprint["sha256"],
+            "grid": grid_signature(raster_metadata(path, catalog)),
+        }
+
+    benchmark = entry(benchmark_path)
+    candidates = {
+        os.path.splitext(os.path.basename(path))[0]: entry(path)
+        for path in candidate_paths
+    }
+    return benchmark, candidates, files
+
+
+def plan_incremental(
+    save_dir, folder, benchmark_path, candidate_paths, context, csv_file, catalog=None
+):
+    """
+    Compare the inputs of a case with the manifest of its previous evaluation.
+
+    context holds the settings the whole case depends on (method, boundary, PWB
+    version, package version, ...); the benchmark hash and grid are added to it.
+    A candidate is up to date when the context is unchanged, its own hash and
+    grid match, and its column and contingency map are still in the outputs.
+    Returns the new manifest, the candidates to evaluate and the existing
+    metrics DataFrame (None when there is nothing to reuse).
+    """
+    previous = load_manifest(save_dir) or {}
+    benchmark, candidates, files = fingerprint_inputs(
+        folder, benchmark_path, candidate_paths, catalog, previous.get("files")
+    )
+    context = dict(context, benchmark=benchmark)
+    manifest = {"context": context, "files": files, "candidates": candidates}
+
+    existing = None
+    if previous.get("context") == context and os.path.exists(csv_file):
+        existing = pd.read_csv(csv_file, float_precision="round_trip")
+
+    contingency_dir = os.path.join(save_dir, "ContingencyMaps")
+    pending = []
+    for path in candidate_paths:
+        name = os.path.splitext(os.path.basename(path))[0]
+        up_to_date = (
+            existing is not None
+            and name in existing.columns
+            and previous.get("candidates", {}).get(name) == candidates[name]
+            and os.path.exists(
+                os.path.join(contingency_dir, f"ContingencyMAP_{name}.tif")
+            )
+        )
+        if not up_to_date:
+            pending.append(path)
+    return manifest, pending, existing
+
+
+# Metrics of the candidates in order, evaluated columns replace the reused ones
+def merge_metrics(existing, evaluated, candidate_names):
+    if evaluated is None:
+        return existing[["Metrics"] + candidate_names]
+    columns = evaluated.set_index("Metrics")
+    if existing is not None:
+        reused = [name for name in candidate_names if name not in columns.columns]
+        columns = columns.join(existing.set_index("Metrics")[reused])
+    return columns[candidate_names].reset_index()
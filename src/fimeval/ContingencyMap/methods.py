@@ -1,27 +1,22 @@
 import os
 import rasterio
 import numpy as np
-from shapely.geometry import shape, box
+from shapely.geometry import box, mapping, MultiPoint
 import geopandas as gpd
-from geopandas import GeoDataFrame
-from shapely.geometry import shape, mapping
-from rasterio.features import shapes
-from shapely.ops import unary_union
 
+from .streaming import get_block_shape, iter_windows
+from ..utilis import raster_metadata
 
-# Smallest raster extent
-def get_smallest_raster_path(benchmark_path, *candidate_paths):
-    def get_raster_shape(raster_path):
-        with rasterio.open(raster_path) as src:
-            return src.shape
 
+# Smallest raster extent
+def get_smallest_raster_path(benchmark_path, *candidate_paths, catalog=None):
     all_paths = [benchmark_path] + list(candidate_paths)
     smallest_raster = None
     smallest_size = float("inf")
 
     for raster_path in all_paths:
-        shape = get_raster_shape(raster_path)
-        size = shape[0] * shape[1]
+        meta = raster_metadata(raster_path, catalog)
+        size = meta.width * meta.height
         if size < smallest_size:
             smallest_size = size
             smallest_raster = raster_path
@@ -29,10 +24,10 @@ def get_smallest_raster_path(benchmark_path, *candidate_paths):
 
 
 # Method 1: Smallest extent
-def smallest_extent(raster_path, save_dir):
-    with rasterio.open(raster_path) as src:
-        bounds = src.bounds
-        crs = src.crs.to_string()
+def smallest_extent(raster_path, save_dir, catalog=None):
+    meta = raster_metadata(raster_path, catalog)
+    bounds = meta.bounds
+    crs = meta.crs.to_string()
     bounding_geom = box(bounds.left, bounds.bottom, bounds.right, bounds.top)
 
     # Save the smallest extent boundary
@@ -45,25 +40,44 @@ def smallest_extent(raster_path, save_dir):
     return [mapping(bounding_geom)]
 
 
+# Column range of the flooded pixels in every row, read block by block
+def flooded_row_extents(src, block_size=None):
+    height, width = src.shape
+    first_col = np.full(height, width, dtype=np.int64)
+    last_col = np.full(height, -1, dtype=np.int64)
+    for window in iter_windows(height, width, get_block_shape(src, block_size)):
+        flooded = src.read(1, window=window) > 0
+        rows = np.flatnonzero(flooded.any(axis=1))
+        if rows.size == 0:
+            continue
+        flooded = flooded[rows]
+        first = flooded.argmax(axis=1) + window.col_off
+        last = window.width - 1 - flooded[:, ::-1].argmax(axis=1) + window.col_off
+        rows = rows + window.row_off
+        first_col[rows] = np.minimum(first_col[rows], first)
+        last_col[rows] = np.maximum(last_col[rows], last)
+    return first_col, last_col
+
+
 # Method 2: Convex Hull
-def convex_hull(raster_path, save_dir):
+def convex_hull(raster_path, save_dir, block_size=None):
+    """
+    The hull of the flooded pixels only depends on the outermost flooded pixel
+    of every row, so it is built from the corners of those pixels instead of
+    polygonizing the flooded regions.
+    """
     with rasterio.open(raster_path) as src:
-        raster_data = src.read(1)
+        first_col, last_col = flooded_row_extents(src, block_size)
         transform = src.transform
-        nodata_value = src.nodata
         crs = src.crs
 
-        if raster_data.dtype not in ["int16", "int32", "uint8", "uint16", "float32"]:
-            raster_data = raster_data.astype("float32")
-
-    raster_data = np.where(raster_data > 0, 1, 0).astype("uint8")
-    mask = raster_data == 1
-
-    feature_generator = shapes(raster_data, mask=mask, transform=transform)
-    polygons = [shape(feature[0]) for feature in feature_generator]
-
-    # Create GeoDataFrame from polygons
-    gdf = GeoDataFrame({"geometry": polygons}, crs=crs)
+    rows = np.flatnonzero(last_col >= 0)
+    corner_rows = np.concatenate([rows, rows + 1, rows, rows + 1])
+    corner_cols = np.concatenate(
+        [first_col[rows], first_col[rows], last_col[rows] + 1, last_col[rows] + 1]
+    )
+    xs, ys = transform * (corner_cols, corner_rows)
+    bounding_geom = MultiPoint(np.column_stack([xs, ys])).convex_hull
 
     # Saving the boundary
     Bound_SHP = os.path.join(save_dir, "BoundaryforEvaluation")
@@ -71,24 +85,16 @@ def convex_hull(raster_path, save_dir):
         os.makedirs(Bound_SHP)
     boundary_shapefile = os.path.join(Bound_SHP, "FIMEvaluatedExtent.shp")
 
-    gdf.to_file(boundary_shapefile, driver="ESRI Shapefile")
-    union_geom = unary_union(gdf.geometry)
-    bounding_geom = union_geom.convex_hull
-
-    bounding_gdf = gpd.GeoDataFrame({"geometry": [bounding_geom]}, crs=gdf.crs)
+    bounding_gdf = gpd.GeoDataFrame({"geometry": [bounding_geom]}, crs=crs)
     bounding_gdf.to_file(boundary_shapefile, driver="ESRI Shapefile")
     return [mapping(bounding_geom)]
 
 
 # Method 3: AOI (User defined shapefile)
-def AOI(benchmark_path, shapefile_path, save_dir):
-    with rasterio.open(benchmark_path) as src:
-        data = src.read(1)
-        if data.dtype not in ["int16", "int32", "uint8", "uint16", "float32"]:
-            data = data.astype("float32")
-        crs = src.crs
-        bounding_geom = gpd.read_file(shapefile_path)
-        bounding_geom = bounding_geom.to_crs(crs)
+def AOI(benchmark_path, shapefile_path, save_dir, catalog=None):
+    crs = raster_metadata(benchmark_path, catalog).crs
+    bounding_geom = gpd.read_file(shapefile_path)
+    bounding_geom = bounding_geom.to_crs(crs)
 
-        bounding_geom = [geom for geom in bounding_geom.geometry]
+    bounding_geom = [geom for geom in bounding_geom.geometry]
     return bounding_geom
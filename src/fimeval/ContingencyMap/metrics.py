@@ -1,43 +1,77 @@
 import numpy as np
 
+# Pixels counted per chunk, keeps the bincount temporaries small
+COUNT_CHUNK_SIZE = 1 << 22
 
-# Get all the evaluation metrics
+# Merged class codes (benchmark 0/2 + candidate 0/1/2/5)
+TN_CODE, FP_CODE, FN_CODE, TP_CODE = 1, 2, 3, 4
+
+
+# Merge a benchmark/candidate pair, returns the merged raster and its (TN, FP, FN, TP)
 def evaluationmetrics(out_image1, out_image2):
     merged = out_image1 + out_image2
-    unique_values, counts = np.unique(merged, return_counts=True)
-    class_pixel_counts = dict(zip(unique_values, counts))
-    class_pixel_counts
-    TN = class_pixel_counts.get(1,0)
-    FP = class_pixel_counts.get(2,0)
-    FN = class_pixel_counts.get(3,0)
-    TP = class_pixel_counts.get(4,0)
+    return merged, counts_from_histogram(class_histogram(merged))
+
+
+# Derive the evaluation metrics from the confusion counts
+def metrics_from_counts(TN, FP, FN, TP):
     epsilon = 1e-8
-    TPR = TP / (TP + FN+epsilon)
-    FNR = FN / (TP + FN+epsilon)
-    Acc = (TP + TN) / (TP + TN + FP + FN+epsilon)
-    Prec = TP / (TP + FP+epsilon)
-    sen = TP / (TP + FN+epsilon)
-    F1_score = 2 * (Prec * sen) / (Prec + sen+epsilon)
-    CSI = TP / (TP + FN + FP+epsilon)
-    POD = TP / (TP + FN+epsilon)
-    FPR = FP / (FP + TN+epsilon)
-    FAR = FP / (TP + FP+epsilon)
-
-    return (
-        unique_values,
-        TN,
-        FP,
-        FN,
-        TP,
-        TPR,
-        FNR,
-        Acc,
-        Prec,
-        sen,
-        CSI,
-        F1_score,
-        POD,
-        FPR,
-        merged,
-        FAR,
-    )
+    TPR = TP / (TP + FN + epsilon)
+    FNR = FN / (TP + FN + epsilon)
+    Acc = (TP + TN) / (TP + TN + FP + FN + epsilon)
+    Prec = TP / (TP + FP + epsilon)
+    sen = TP / (TP + FN + epsilon)
+    F1_score = 2 * (Prec * sen) / (Prec + sen + epsilon)
+    CSI = TP / (TP + FN + FP + epsilon)
+    POD = TP / (TP + FN + epsilon)
+    FPR = FP / (FP + TN + epsilon)
+    FAR = FP / (TP + FP + epsilon)
+    return TPR, FNR, Acc, Prec, sen, CSI, F1_score, POD, FPR, FAR
+
+
+# Histogram of the merged class codes in a single linear pass
+def class_histogram(merged):
+    merged = np.asarray(merged).ravel()
+    histogram = np.zeros(256, dtype=np.int64)
+    for start in range(0, merged.size, COUNT_CHUNK_SIZE):
+        chunk = merged[start : start + COUNT_CHUNK_SIZE]
+        if chunk.dtype != np.uint8:
+            # Only whole codes in 0-255 are class codes, other values must not wrap into them
+            valid = (chunk >= 0) & (chunk < 256)
+            if chunk.dtype.kind == "f":
+                valid &= chunk == np.floor(chunk)
+            chunk = chunk[valid].astype(np.int64)
+        histogram += np.bincount(chunk, minlength=256)
+    return histogram
+
+
+# Get the confusion counts out of a class histogram
+def counts_from_histogram(histogram):
+    return tuple(int(histogram[code]) for code in (TN_CODE, FP_CODE, FN_CODE, TP_CODE))
+
+
+# Fused merge and count of a benchmark/candidate pair without the merged raster
+def confusion_counts(out_image1, out_image2):
+    return confusion_counts_batch(out_image1, [out_image2])[0]
+
+
+# Count many candidates against one benchmark in one pass over the benchmark
+def confusion_counts_batch(out_image1, candidates):
+    benchmark = np.asarray(out_image1).ravel()
+    candidates = [np.asarray(candidate).ravel() for candidate in candidates]
+    for candidate in candidates:
+        if candidate.size != benchmark.size:
+            raise ValueError(
+                "Candidate and benchmark must be on the same grid to be counted."
+            )
+
+    histograms = [np.zeros(256, dtype=np.int64) for _ in candidates]
+    for start in range(0, benchmark.size, COUNT_CHUNK_SIZE):
+        stop = start + COUNT_CHUNK_SIZE
+        benchmark_chunk = benchmark[start:stop]
+        if benchmark_chunk.dtype == np.uint8:
+            # A sum of two uint8 codes can exceed 255
+            benchmark_chunk = benchmark_chunk.astype(np.uint16)
+        for histogram, candidate in zip(histograms, candidates):
+            histogram += class_histogram(benchmark_chunk + candidate[start:stop])
+    return [counts_from_histogram(histogram) for histogram in histograms]
@@ -3,9 +3,11 @@ import glob
 import pandas as pd
 import plotly.express as px
 
+from .rendering import render_batch
 
-# Function to plot individual metric scores
-def PlotMetrics(csv_path, method_path):
+
+# Metric scores of an EvaluationMetrics CSV, one score column per candidate
+def metric_scores(csv_path):
     metrics_df = pd.read_csv(csv_path)
     # Extract relevant metrics
     metrics = metrics_df.loc[
@@ -24,79 +26,103 @@ def PlotMetrics(csv_path, method_path):
         }
     )
     value_columns = metrics.select_dtypes(include="number").columns
-
     for value_column in value_columns:
         metrics[value_column] = metrics[value_column].round(2)
+    return metrics, list(value_columns)
 
-        # Create the bar plot
-        fig = px.bar(
-            metrics,
-            x=value_column,
-            y="Metrics",
-            title=f"Performance Metrics",
-            labels={value_column: "Score"},
-            text=value_column,
-            color="Metrics",
-            color_discrete_sequence=px.colors.qualitative.Set2,
-        )
-        fig.update_traces(texttemplate="%{text:.2f}", textposition="outside")
-        fig.update_layout(
-            yaxis_title="Metrics",
-            xaxis_title="Score",
-            showlegend=False,
-            plot_bgcolor="rgba(0, 0, 0, 0)",
-            paper_bgcolor="rgba(0, 0, 0, 0)",
-            margin=dict(l=10, r=10, t=40, b=10),
-            xaxis=dict(showline=True, linewidth=2, linecolor="black"),
-            yaxis=dict(showline=True, linewidth=2, linecolor="black"),
-            height=350,
-            width=900,
-            title_font=dict(family="Arial", size=24, color="black"),
-            xaxis_title_font=dict(family="Arial", size=20, color="black"),
-            yaxis_title_font=dict(family="Arial", size=20, color="black"),
-            font=dict(family="Arial", size=18, color="black"),
-        )
 
-        # Save each plot as a PNG, using the column name as the filename
-        plot_dir = os.path.join(method_path, "FinalPlots")
-        if not os.path.exists(plot_dir):
-            os.makedirs(plot_dir)
+# Function to plot the metric scores of one candidate
+def plot_metric(csv_path, method_path, value_column, show=True):
+    metrics, _ = metric_scores(csv_path)
 
-        output_filename = f"EvaluationMetrics_{value_column}.png"
-        output_path = os.path.join(plot_dir, output_filename)
+    # Create the bar plot
+    fig = px.bar(
+        metrics,
+        x=value_column,
+        y="Metrics",
+        title=f"Performance Metrics",
+        labels={value_column: "Score"},
+        text=value_column,
+        color="Metrics",
+        color_discrete_sequence=px.colors.qualitative.Set2,
+    )
+    fig.update_traces(texttemplate="%{text:.2f}", textposition="outside")
+    fig.update_layout(
+        yaxis_title="Metrics",
+        xaxis_title="Score",
+        showlegend=False,
+        plot_bgcolor="rgba(0, 0, 0, 0)",
+        paper_bgcolor="rgba(0, 0, 0, 0)",
+        margin=dict(l=10, r=10, t=40, b=10),
+        xaxis=dict(showline=True, linewidth=2, linecolor="black"),
+        yaxis=dict(showline=True, linewidth=2, linecolor="black"),
+        height=350,
+        width=900,
+        title_font=dict(family="Arial", size=24, color="black"),
+        xaxis_title_font=dict(family="Arial", size=20, color="black"),
+        yaxis_title_font=dict(family="Arial", size=20, color="black"),
+        font=dict(family="Arial", size=18, color="black"),
+    )
 
-        # Save the plot as PNG
-        fig.write_image(output_path, engine="kaleido", scale=500 / 96)
-        print(
-            f"Performance metrics chart ({value_column}) saved as PNG at {output_path}"
-        )
+    # Save each plot as a PNG, using the column name as the filename
+    plot_dir = os.path.join(method_path, "FinalPlots")
+    os.makedirs(plot_dir, exist_ok=True)
+
+    output_filename = f"EvaluationMetrics_{value_column}.png"
+    output_path = os.path.join(plot_dir, output_filename)
+
+    # Save the plot as PNG
+    fig.write_image(output_path, engine="kaleido", scale=500 / 96)
+    print(f"Performance metrics chart ({value_column}) saved as PNG at {output_path}")
+    if show:
         fig.show()
+    return output_path
 
 
-def PlotEvaluationMetrics(main_dir, method_name, out_dir):
+# Function to plot individual metric scores
+def PlotMetrics(csv_path, method_path, show=True):
+    _, value_columns = metric_scores(csv_path)
+    return [
+        plot_metric(csv_path, method_path, value_column, show=show)
+        for value_column in value_columns
+    ]
+
 
+# Metric plots to render, as (csv_path, method_path, value_column) tuples
+def metric_jobs(main_dir, method_name, out_dir):
     # If main directory contains the .tif files directly
     tif_files_main = glob.glob(os.path.join(main_dir, "*.tif"))
     if tif_files_main:
-        method_path = os.path.join(out_dir, os.path.basename(main_dir), method_name)
+        method_paths = [os.path.join(out_dir, os.path.basename(main_dir), method_name)]
+    # Traverse all folders in main_dir if no .tif files directly in main_dir
+    else:
+        method_paths = [
+            os.path.join(out_dir, folder, method_name)
+            for folder in os.listdir(main_dir)
+            if os.path.isdir(os.path.join(out_dir, folder))
+        ]
+
+    jobs = []
+    for method_path in method_paths:
         Evaluation_Metrics = os.path.join(method_path, "EvaluationMetrics")
-        csv_files = os.path.join(Evaluation_Metrics, "EvaluationMetrics.csv")
-        if not csv_files:
+        csv_file = os.path.join(Evaluation_Metrics, "EvaluationMetrics.csv")
+        if not os.path.exists(csv_file):
             print(f"No EvaluationMetrics CSV files found in '{Evaluation_Metrics}'.")
-        else:
-            PlotMetrics(csv_files, method_path)
+            continue
+        _, value_columns = metric_scores(csv_file)
+        jobs.extend((csv_file, method_path, column) for column in value_columns)
+    return jobs
 
-    # Traverse all folders in main_dir if no .tif files directly in main_dir
-    else:
-        for folder in os.listdir(main_dir):
-            folder_path = os.path.join(out_dir, folder)
-            if os.path.isdir(folder_path):
-                method_path = os.path.join(folder_path, method_name)
-                Evaluation_Metrics = os.path.join(method_path, "EvaluationMetrics")
-                csv_files = os.path.join(Evaluation_Metrics, "EvaluationMetrics.csv")
-                if not csv_files:
-                    print(
-                        f"No EvaluationMetrics CSV files found in '{Evaluation_Metrics}'."
-                    )
-                else:
-                    PlotMetrics(csv_files, method_path)
+
+def PlotEvaluationMetrics(main_dir, method_name, out_dir, headless=False, workers=None):
+    """
+    With headless=True the charts are rendered without ever calling show, in a
+    pool of `workers` processes when workers > 1, and the time of each figure
+    is reported.
+    """
+    jobs = metric_jobs(main_dir, method_name, out_dir)
+    if headless:
+        return render_batch(plot_metric, jobs, workers)
+
+    for csv_file, method_path, value_column in jobs:
+        plot_metric(csv_file, method_path, value_column)
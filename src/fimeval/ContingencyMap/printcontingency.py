@@ -1,45 +1,95 @@
 import os
+import math
 import glob
 import rasterio
 import numpy as np
-from pyproj import Transformer
+from rasterio.enums import Resampling
+from rasterio.warp import transform_bounds
 from matplotlib.patches import Patch
 from matplotlib import colors as mcolors
 import matplotlib.pyplot as plt
 
+from .rendering import render_batch
 
-def getContingencyMap(raster_path, method_path):
+
+#Size (inches) of the contingency map figures
+FIGSIZE = (12, 11)
+
+#Classes drawn on the contingency map, any other value is shown as true negative
+CONTINGENCY_CLASSES = (0, 1, 2, 3, 4, 5)
+
+
+#Map the contingency raster values to the plotted classes with a lookup table
+def contingency_classes(band1, nodata_value=None):
+    if band1.dtype == np.uint8:
+        lut = np.ones(256, dtype=np.uint8)
+        lut[list(CONTINGENCY_CLASSES)] = CONTINGENCY_CLASSES
+        if nodata_value is not None and nodata_value in range(256):
+            lut[int(nodata_value)] = 0
+        return lut[band1]
+
+    combined_flood = np.where(np.isin(band1, CONTINGENCY_CLASSES), band1, 1).astype(
+        np.uint8
+    )
+    # Handle NoData explicitly, mapping it to "No Data" class (0)
+    if nodata_value is not None:
+        combined_flood[band1 == nodata_value] = 0
+    return combined_flood
+
+
+#Lon/lat extent of the pixel centres, from the densified raster edges
+def geographic_extent(transform, width, height, src_crs):
+    left, top = transform * (0.5, 0.5)
+    right, bottom = transform * (width - 0.5, height - 0.5)
+    west, south, east, north = transform_bounds(
+        src_crs,
+        "EPSG:4326",
+        min(left, right),
+        min(top, bottom),
+        max(left, right),
+        max(top, bottom),
+        densify_pts=21,
+    )
+    return west, east, south, north
+
+
+#Decimation factor so the raster is read at about the pixel size of the saved figure
+def overview_factor(width, height, dpi):
+    return max(
+        1,
+        math.ceil(width / (FIGSIZE[0] * dpi)),
+        math.ceil(height / (FIGSIZE[1] * dpi)),
+    )
+
+
+def getContingencyMap(raster_path, method_path, overview=False, dpi=500, show=True):
+    """
+    With overview=True the contingency raster is read decimated to the pixel
+    size of the saved figure (mode resampling, served from the raster overviews
+    when present) instead of at full resolution.
+    """
     # Load the raster
     with rasterio.open(raster_path) as src:
-        band1 = src.read(1)
+        factor = overview_factor(src.width, src.height, dpi) if overview else 1
+        if factor > 1:
+            band1 = src.read(
+                1,
+                out_shape=(
+                    math.ceil(src.height / factor),
+                    math.ceil(src.width / factor),
+                ),
+                resampling=Resampling.mode,
+            )
+        else:
+            band1 = src.read(1)
         transform = src.transform
+        width, height = src.width, src.height
         src_crs = src.crs
         nodata_value = src.nodatavals[0] if src.nodatavals else None
-    combined_flood = np.full_like(band1, fill_value=1, dtype=int)
+    combined_flood = contingency_classes(band1, nodata_value)
+    del band1
 
-    # Map pixel values to colors
-    combined_flood[band1 == 5] = 5
-    combined_flood[band1 == 0] = 0
-    combined_flood[band1 == 1] = 1
-    combined_flood[band1 == 2] = 2
-    combined_flood[band1 == 3] = 3
-    combined_flood[band1 == 4] = 4
-
-    # Handle NoData explicitly, mapping it to "No Data" class (1)
-    if nodata_value is not None:
-        combined_flood[band1 == nodata_value] = 1
-
-    rows, cols = np.indices(band1.shape)
-    xs, ys = rasterio.transform.xy(transform, rows, cols)
-    xs = np.array(xs)
-    ys = np.array(ys)
-
-    dst_crs = "EPSG:4326"
-    transformer = Transformer.from_crs(src_crs, dst_crs, always_xy=True)
-    flat_xs, flat_ys = xs.ravel(), ys.ravel()
-    longitudes, latitudes = transformer.transform(flat_xs, flat_ys)
-    xs_dd = np.array(longitudes).reshape(xs.shape)
-    ys_dd = np.array(latitudes).reshape(ys.shape)
+    west, east, south, north = geographic_extent(transform, width, height, src_crs)
 
     # Define the color map and normalization
     flood_colors = ["white", "grey", "green", "blue", "red", "black"]  # 6 classes
@@ -49,13 +99,13 @@ def getContingencyMap(raster_path, method_path):
     )
 
     # Plot the raster with transformed coordinates
-    plt.figure(figsize=(12, 11))
+    fig = plt.figure(figsize=FIGSIZE)
     plt.imshow(
         combined_flood,
         cmap=flood_cmap,
         norm=flood_norm,
         interpolation="none",
-        extent=(xs_dd.min(), xs_dd.max(), ys_dd.min(), ys_dd.max()),
+        extent=(west, east, south, north),
     )
 
     # Create legend patches
@@ -84,8 +134,8 @@ def getContingencyMap(raster_path, method_path):
     plt.tick_params(axis="both", labelsize=14, width=1.5)
 
     # Adjust tick formatting
-    x_ticks = np.linspace(xs_dd.min(), xs_dd.max(), 5)
-    y_ticks = np.linspace(ys_dd.min(), ys_dd.max(), 5)
+    x_ticks = np.linspace(west, east, 5)
+    y_ticks = np.linspace(south, north, 5)
     plt.xticks(x_ticks, [f"{abs(tick):.2f}" for tick in x_ticks])
     plt.yticks(y_ticks, [f"{abs(tick):.2f}" for tick in y_ticks])
     plt.legend(handles=legend_patches, loc="lower left")
@@ -100,45 +150,55 @@ def getContingencyMap(raster_path, method_path):
     # Base name of the raster file
     base_name = os.path.basename(raster_path).split(".")[0]
     output_path = os.path.join(plot_dir, f"{base_name}.png")
-    plt.savefig(output_path, dpi=500, bbox_inches="tight")
-    plt.show()
+    plt.savefig(output_path, dpi=dpi, bbox_inches="tight")
+    if show:
+        plt.show()
+    else:
+        plt.close(fig)
+    return output_path
 
 
-def PrintContingencyMap(main_dir, method_name, out_dir):
+#Contingency rasters to print, as (raster_path, method_path) pairs
+def contingency_jobs(main_dir, method_name, out_dir):
+    jobs = []
     # Check for .tif files directly in main_dir
     tif_files_main = glob.glob(os.path.join(main_dir, "*.tif"))
 
     if tif_files_main:
-        method_path = os.path.join(out_dir, os.path.basename(main_dir), method_name)
-        contingency_path = os.path.join(method_path, "ContingencyMaps")
+        method_paths = [os.path.join(out_dir, os.path.basename(main_dir), method_name)]
+    # Traverse all folders in main_dir if no .tif files directly in main_dir
+    else:
+        method_paths = [
+            os.path.join(out_dir, folder, method_name)
+            for folder in os.listdir(main_dir)
+            if os.path.isdir(os.path.join(out_dir, folder))
+        ]
 
+    for method_path in method_paths:
+        contingency_path = os.path.join(method_path, "ContingencyMaps")
         if os.path.exists(contingency_path):
             tif_files = glob.glob(os.path.join(contingency_path, "*.tif"))
             if not tif_files:
                 print(f"No Contingency TIFF files found in '{contingency_path}'.")
-            else:
-                for tif_file in tif_files:
-                    print(f"****** Printing Contingency Map for {tif_file} ******")
-                    getContingencyMap(tif_file, method_path)
+            jobs.extend((tif_file, method_path) for tif_file in tif_files)
+    return jobs
+
+
+def PrintContingencyMap(
+    main_dir, method_name, out_dir, overview=False, dpi=500, headless=False, workers=None
+):
+    """
+    With headless=True the maps are rendered without ever calling show, in a
+    pool of `workers` processes when workers > 1, and the time of each figure
+    is reported.
+    """
+    jobs = [
+        (tif_file, method_path, overview, dpi)
+        for tif_file, method_path in contingency_jobs(main_dir, method_name, out_dir)
+    ]
+    if headless:
+        return render_batch(getContingencyMap, jobs, workers)
 
-    # Traverse all folders in main_dir if no .tif files directly in main_dir
-    else:
-        for folder in os.listdir(main_dir):
-            folder_path = os.path.join(out_dir, folder)
-            if os.path.isdir(folder_path):
-                method_path = os.path.join(folder_path, method_name)
-                contingency_path = os.path.join(method_path, "ContingencyMaps")
-
-                if os.path.exists(contingency_path):
-                    tif_files = glob.glob(os.path.join(contingency_path, "*.tif"))
-
-                    if not tif_files:
-                        print(
-                            f"No Contingency TIFF files found in '{contingency_path}'."
-                        )
-                    else:
-                        for tif_file in tif_files:
-                            print(
-                                f"****** Printing Contingency Map for {tif_file} ******"
-                            )
-                            getContingencyMap(tif_file, method_path)
+    for tif_file, method_path, overview, dpi in jobs:
+        print(f"****** Printing Contingency Map for {tif_file} ******")
+        getContingencyMap(tif_file, method_path, overview=overview, dpi=dpi)
@@ -0,0 +1,37 @@
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+
+# Each render worker draws with the non-interactive Agg backend, plotly keeps a
+# single kaleido process alive per worker across all the figures it saves
+def _init_render_worker():
+    import matplotlib
+
+    matplotlib.use("Agg")
+
+
+def _timed_render(render, args):
+    start = time.perf_counter()
+    output_path = render(*args, show=False)
+    return output_path, time.perf_counter() - start
+
+
+# Render a batch of figures headlessly, optionally spread over a process pool
+def render_batch(render, jobs, workers=None):
+    """
+    Call render(*args, show=False) for every args tuple in jobs and report the
+    time taken by each figure. With workers > 1 the figures are rendered in a
+    pool of worker processes. Returns a list of (output_path, seconds).
+    """
+    if workers and workers > 1 and len(jobs) > 1:
+        with ProcessPoolExecutor(
+            max_workers=min(workers, len(jobs)), initializer=_init_render_worker
+        ) as executor:
+            futures = [executor.submit(_timed_render, render, args) for args in jobs]
+            timings = [future.result() for future in futures]
+    else:
+        timings = [_timed_render(render, args) for args in jobs]
+
+    for output_path, seconds in timings:
+        print(f"Rendered {output_path} in {seconds:.2f}s")
+    return timings
@@ -0,0 +1,131 @@
+import os
+import json
+import uuid
+import shutil
+import hashlib
+
+# Size the local result cache is trimmed to after every write, in bytes
+DEFAULT_CACHE_SIZE = 5 * 1024**3
+RESULT_NAME = "result.json"
+
+
+class LocalResultCache:
+    """
+    Content-addressed store of evaluation results in a local directory.
+
+    Every entry is a folder named by its key holding the JSON result and the
+    output files of the evaluation, stored under their path relative to the
+    case output folder. Hits refresh the entry's mtime, and the least recently
+    used entries are evicted once the cache grows over max_bytes.
+
+    Any object with the same get/put methods can be passed to evaluateFIM as
+    result_cache instead, e.g. a shared or remote backend.
+    """
+
+    def __init__(self, cache_dir, max_bytes=DEFAULT_CACHE_SIZE):
+        self.cache_dir = os.fspath(cache_dir)
+        self.max_bytes = max_bytes
+        # Running size of the entries, summed from their result files on the first put
+        self.total_bytes = None
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def entry_dir(self, key):
+        return os.path.join(self.cache_dir, key[:2], key)
+
+    # (result, {relative path: cached file}) of a key, or None on a miss
+    def get(self, key):
+        entry_dir = self.entry_dir(key)
+        result_path = os.path.join(entry_dir, RESULT_NAME)
+        try:
+            with open(result_path) as f:
+                result = json.load(f)
+            os.utime(result_path)
+        except (OSError, ValueError):
+            return None
+        result.pop("size", None)
+        files = {
+            relative_path: os.path.join(entry_dir, "files", relative_path)
+            for relative_path in result.pop("files", [])
+        }
+        return result, files
+
+    def put(self, key, result, files):
+        entry_dir = self.entry_dir(key)
+        if os.path.exists(entry_dir):
+            return
+        # Entries are staged next to their final place and renamed in one step
+        tmp_dir = os.path.join(self.cache_dir, f".tmp-{uuid.uuid4().hex}")
+        size = 0
+        for relative_path, path in files.items():
+            cached_path = os.path.join(tmp_dir, "files", relative_path)
+            os.makedirs(os.path.dirname(cached_path), exist_ok=True)
+            shutil.copyfile(path, cached_path)
+            size += os.path.getsize(cached_path)
+        os.makedirs(tmp_dir, exist_ok=True)
+        with open(os.path.join(tmp_dir, RESULT_NAME), "w") as f:
+            json.dump(dict(result, files=sorted(files), size=size), f)
+        os.makedirs(os.path.dirname(entry_dir), exist_ok=True)
+        try:
+            os.rename(tmp_dir, entry_dir)
+        except OSError:
+            # Written concurrently by another evaluation
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            return
+
+        if self.total_bytes is None:
+            self.total_bytes = sum(size for _, _, size in self.entry_stats())
+        else:
+            self.total_bytes += size
+        if self.total_bytes > self.max_bytes:
+            self.evict()
+
+    def entries(self):
+        for prefix in os.listdir(self.cache_dir):
+            prefix_dir = os.path.join(self.cache_dir, prefix)
+            if prefix.startswith(".tmp-") or not os.path.isdir(prefix_dir):
+                continue
+            for key in os.listdir(prefix_dir):
+                yield os.path.join(prefix_dir, key)
+
+    # (entry folder, last use, size) of every entry, sizes are read from the result files
+    def entry_stats(self):
+        for entry_dir in self.entries():
+            result_path = os.path.join(entry_dir, RESULT_NAME)
+            try:
+                last_used = os.stat(result_path).st_mtime_ns
+                with open(result_path) as f:
+                    size = json.load(f)["size"]
+            except (OSError, ValueError, KeyError):
+                continue
+            yield entry_dir, last_used, size
+
+    # Drop the least recently used entries until the cache fits in max_bytes
+    def evict(self):
+        # Rescanned here, other processes may have added entries since the last count
+        stats = sorted(self.entry_stats(), key=lambda stat: stat[1])
+        total = sum(size for _, _, size in stats)
+        for entry_dir, _, size in stats:
+            if total <= self.max_bytes:
+                break
+            shutil.rmtree(entry_dir, ignore_errors=True)
+            total -= size
+        self.total_bytes = total
+
+
+# A cache directory path or a cache backend object
+def open_result_cache(result_cache):
+    if result_cache is None or hasattr(result_cache, "get"):
+        return result_cache
+    return LocalResultCache(result_cache)
+
+
+def result_key(*parts):
+    return hashlib.sha256(json.dumps(parts, sort_keys=True).encode()).hexdigest()
+
+
+# Copy the cached output files of an entry into the case output folder
+def restore_files(files, save_dir):
+    for relative_path, cached_path in files.items():
+        output_path = os.path.join(save_dir, relative_path)
+        os.makedirs(os.path.dirname(output_path), exist_ok=True)
+        shutil.copyfile(cached_path, output_path)
@@ -0,0 +1,140 @@
+import os
+import uuid
+import sqlite3
+
+# Tidy result row of one benchmark/candidate evaluation, with its SQLite type
+RESULT_COLUMNS = [
+    ("case_name", "TEXT"),
+    ("benchmark", "TEXT"),
+    ("candidate", "TEXT"),
+    ("method", "TEXT"),
+    ("output_dir", "TEXT"),
+    ("TN", "INTEGER"),
+    ("FP", "INTEGER"),
+    ("FN", "INTEGER"),
+    ("TP", "INTEGER"),
+    ("CSI", "REAL"),
+    ("TPR", "REAL"),
+    ("FNR", "REAL"),
+    ("Acc", "REAL"),
+    ("Prec", "REAL"),
+    ("sen", "REAL"),
+    ("F1", "REAL"),
+    ("POD", "REAL"),
+    ("FPR", "REAL"),
+    ("FAR", "REAL"),
+    # Building based metrics, NULL when no building footprint was evaluated
+    ("building_TP", "INTEGER"),
+    ("building_FP", "INTEGER"),
+    ("building_FN", "INTEGER"),
+    ("building_CSI", "REAL"),
+    ("building_FAR", "REAL"),
+    ("building_POD", "REAL"),
+    ("building_BDR", "REAL"),
+    ("cached", "INTEGER"),
+    ("case_seconds", "REAL"),
+    ("candidate_seconds", "REAL"),
+    ("evaluated_at", "TEXT"),
+]
+RESULT_TABLE = "evaluation_results"
+DEFAULT_BATCH_SIZE = 500
+
+
+class ResultSink:
+    """
+    Buffer result rows and write them batch_size at a time; call close (or use
+    it as a context manager) to write the last partial batch.
+    """
+
+    def __init__(self, batch_size=DEFAULT_BATCH_SIZE):
+        self.batch_size = batch_size
+        self.rows = []
+
+    def write(self, rows):
+        self.rows.extend(rows)
+        if len(self.rows) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if self.rows:
+            self.write_batch(self.rows)
+            self.rows = []
+
+    def close(self):
+        self.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+# Single SQLite database, one transaction per batch
+class SQLiteResultSink(ResultSink):
+    def __init__(self, db_path, batch_size=DEFAULT_BATCH_SIZE):
+        super().__init__(batch_size)
+        self.connection = sqlite3.connect(os.fspath(db_path), timeout=60)
+        columns = ", ".join(f'"{name}" {kind}' for name, kind in RESULT_COLUMNS)
+        with self.connection:
+            self.connection.execute(
+                f"CREATE TABLE IF NOT EXISTS {RESULT_TABLE} ({columns})"
+            )
+            self.connection.execute(
+                f"CREATE INDEX IF NOT EXISTS {RESULT_TABLE}_case "
+                f"ON {RESULT_TABLE} (case_name, candidate)"
+            )
+
+    def write_batch(self, rows):
+        names = [name for name, _ in RESULT_COLUMNS]
+        columns = ", ".join(f'"{name}"' for name in names)
+        placeholders = ", ".join("?" for _ in names)
+        with self.connection:
+            self.connection.executemany(
+                f"INSERT INTO {RESULT_TABLE} ({columns}) VALUES ({placeholders})",
+                [tuple(row.get(name) for name in names) for row in rows],
+            )
+
+    def close(self):
+        super().close()
+        self.connection.close()
+
+
+# Parquet dataset directory, one part file per batch
+class ParquetResultSink(ResultSink):
+    def __init__(self, dataset_dir, batch_size=DEFAULT_BATCH_SIZE):
+        super().__init__(batch_size)
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError as e:
+            raise ImportError(
+                "Writing results to Parquet requires pyarrow, install it or use a "
+                "SQLite (.db/.sqlite) results sink instead."
+            ) from e
+        self.dataset_dir = os.fspath(dataset_dir)
+        os.makedirs(self.dataset_dir, exist_ok=True)
+
+    def write_batch(self, rows):
+        import pandas as pd
+
+        df = pd.DataFrame(rows, columns=[name for name, _ in RESULT_COLUMNS])
+        for name, kind in RESULT_COLUMNS:
+            if kind == "REAL":
+                df[name] = df[name].astype("float64")
+            elif kind == "INTEGER":
+                df[name] = df[name].astype("Int64")
+        df["cached"] = df["cached"].astype(bool)
+        part_path = os.path.join(self.dataset_dir, f"part-{uuid.uuid4().hex}.parquet")
+        df.to_parquet(part_path, index=False)
+
+
+def open_result_sink(results_sink, batch_size=DEFAULT_BATCH_SIZE):
+    """
+    results_sink is a ResultSink, a SQLite database path (.db, .sqlite,
+    .sqlite3) or a Parquet dataset directory (any other path).
+    """
+    if results_sink is None or isinstance(results_sink, ResultSink):
+        return results_sink
+    if os.fspath(results_sink).lower().endswith((".db", ".sqlite", ".sqlite3")):
+        return SQLiteResultSink(results_sink, batch_size)
+    return ParquetResultSink(results_sink, batch_size)
@@ -0,0 +1,266 @@
+import os
+import tempfile
+import numpy as np
+import rasterio
+from rasterio import features
+from rasterio.enums import Resampling
+from rasterio.vrt import WarpedVRT
+from rasterio.windows import Window
+
+from .metrics import class_histogram
+from ..utilis import class_raster_profile, CLASS_NODATA
+
+# Target window edge (in pixels) when walking the evaluation grid
+DEFAULT_BLOCK_SIZE = 1024
+
+
+# Get the window shape used to walk the benchmark grid
+def get_block_shape(src, block_size=None):
+    if block_size:
+        if isinstance(block_size, int):
+            return (block_size, block_size)
+        return tuple(block_size)
+
+    # Use whole multiples of the GeoTIFF internal tiles/strips
+    block_h, block_w = src.block_shapes[0]
+    block_h = block_h * max(1, DEFAULT_BLOCK_SIZE // block_h)
+    block_w = block_w * max(1, DEFAULT_BLOCK_SIZE // block_w)
+    return (block_h, min(block_w, src.width))
+
+
+# Iterate over the windows covering a grid of the given shape
+def iter_windows(height, width, block_shape):
+    block_h, block_w = block_shape
+    for row_off in range(0, height, block_h):
+        for col_off in range(0, width, block_w):
+            yield Window(
+                col_off,
+                row_off,
+                min(block_w, width - col_off),
+                min(block_h, height - row_off),
+            )
+
+
+# Warp a candidate lazily onto the benchmark evaluation grid
+def candidate_vrt(src, crs, transform, width, height):
+    # The alpha band flags pixels that fall outside the candidate extent
+    return WarpedVRT(
+        src,
+        crs=crs,
+        transform=transform,
+        width=width,
+        height=height,
+        resampling=Resampling.nearest,
+        src_nodata=None,
+        nodata=None,
+        add_alpha=True,
+    )
+
+
+# Rasterize geometries once over a whole grid into a disk-backed mask
+def grid_mask(geometries, transform, shape, path, all_touched=False):
+    """
+    Same rasterization as features.geometry_mask on the full grid, so windows
+    sliced from it match the in-memory evaluation exactly. Rasterizing every
+    window on its own resolves edges through pixel corners differently per
+    window, which made the counts depend on the block size.
+    """
+    mask = np.memmap(path, dtype=np.uint8, mode="w+", shape=shape)
+    features.rasterize(
+        geometries,
+        out=mask,
+        transform=transform,
+        fill=0,
+        default_value=1,
+        all_touched=all_touched,
+    )
+    return mask
+
+
+# Block-streaming evaluation of one benchmark against many candidates
+def evaluate_blockwise(
+    benchmark_path,
+    candidate_paths,
+    pwb_shapes,
+    bounding_geom,
+    clipped_paths,
+    contingency_paths,
+    block_size=None,
+    pwb_mask_path=None,
+    points=None,
+):
+    """
+    Walk the clipped benchmark grid window by window, warping every candidate
+    onto it on the fly, and write the clipped and contingency rasters window by
+    window. Returns the class histogram of the merged raster per candidate, so
+    peak memory depends on the window size rather than the scene size.
+
+    points is an optional (rows, cols) pair of pixel positions on the clipped
+    grid (building centroids). The benchmark, candidate and merged classes
+    under them are tallied per window and returned as a second value, one
+    (3, 256) array of benchmark, candidate and merged histograms per
+    candidate, or None.
+
+    clipped_paths holds the benchmark output followed by one path per candidate.
+    If pwb_mask_path exists the PWB mask is read from it, otherwise it is
+    rasterized and, when a path is given, written there for reruns. The
+    boundary and PWB masks are rasterized once over the clipped grid into
+    temporary uint8 files (one byte per pixel on disk, not in memory).
+    """
+    histograms = [np.zeros(256, dtype=np.int64) for _ in candidate_paths]
+    point_histograms = None
+    if points is not None:
+        point_histograms = [
+            np.zeros((3, 256), dtype=np.int64) for _ in candidate_paths
+        ]
+
+    with rasterio.open(benchmark_path) as src1, tempfile.TemporaryDirectory(
+        ignore_cleanup_errors=True
+    ) as mask_dir:
+        clip_window = features.geometry_window(src1, bounding_geom)
+        out_transform1 = src1.window_transform(clip_window)
+        height, width = int(clip_window.height), int(clip_window.width)
+        benchmark_nodata = src1.nodata
+
+        profile = class_raster_profile(src1.crs, out_transform1, width, height)
+        block_shape = get_block_shape(src1, block_size)
+
+        # Sort the points by window so each window picks its own slice
+        if points is not None:
+            point_rows, point_cols = points
+            n_block_cols = -(-width // block_shape[1])
+            point_keys = (point_rows // block_shape[0]) * n_block_cols + (
+                point_cols // block_shape[1]
+            )
+            point_order = np.argsort(point_keys, kind="stable")
+            point_keys = point_keys[point_order]
+
+        candidates = [rasterio.open(path) for path in candidate_paths]
+        vrts = [
+            candidate_vrt(src2, src1.crs, out_transform1, width, height)
+            for src2 in candidates
+        ]
+        clipped_dsts = [rasterio.open(path, "w", **profile) for path in clipped_paths]
+        contingency_dsts = [
+            rasterio.open(path, "w", **profile) for path in contingency_paths
+        ]
+        mask_src = mask_dst = None
+        if pwb_mask_path and os.path.exists(pwb_mask_path):
+            mask_src = rasterio.open(pwb_mask_path)
+        elif pwb_mask_path:
+            mask_dst = rasterio.open(f"{pwb_mask_path}.tmp", "w", **profile)
+        mask_datasets = [ds for ds in (mask_src, mask_dst) if ds is not None]
+
+        inside_grid = grid_mask(
+            bounding_geom,
+            out_transform1,
+            (height, width),
+            os.path.join(mask_dir, "boundary.u8"),
+            all_touched=True,
+        )
+        pwb_grid = None
+        if mask_src is None and pwb_shapes:
+            pwb_grid = grid_mask(
+                pwb_shapes,
+                out_transform1,
+                (height, width),
+                os.path.join(mask_dir, "pwb.u8"),
+            )
+        try:
+            for window in iter_windows(height, width, block_shape):
+                grid_window = window.toslices()
+                win_shape = (int(window.height), int(window.width))
+                src_window = Window(
+                    clip_window.col_off + window.col_off,
+                    clip_window.row_off + window.row_off,
+                    window.width,
+                    window.height,
+                )
+
+                # Pixels inside the evaluation boundary
+                inside = inside_grid[grid_window] == 1
+
+                # Permanent water bodies in this window
+                pwb_mask = None
+                if mask_src is not None:
+                    pwb_mask = mask_src.read(1, window=window) == 1
+                elif pwb_grid is not None:
+                    pwb_mask = pwb_grid[grid_window] == 1
+                if mask_dst is not None:
+                    mask_dst.write(
+                        (
+                            np.zeros(win_shape, dtype=np.uint8)
+                            if pwb_mask is None
+                            else pwb_mask.astype(np.uint8)
+                        ),
+                        1,
+                        window=window,
+                    )
+
+                benchmark = src1.read(1, window=src_window)
+                wet = benchmark > 0
+                if benchmark_nodata is not None:
+                    wet &= benchmark != benchmark_nodata
+                benchmark_codes = np.where(wet & inside, 2, 0).astype(np.uint8)
+                if pwb_mask is not None:
+                    benchmark_codes[pwb_mask] = 0
+                clipped_dsts[0].write(
+                    np.where(inside, benchmark_codes, CLASS_NODATA), 1, window=window
+                )
+
+                window_points = None
+                if points is not None:
+                    key = (int(window.row_off) // block_shape[0]) * n_block_cols + (
+                        int(window.col_off) // block_shape[1]
+                    )
+                    lo, hi = np.searchsorted(point_keys, [key, key + 1])
+                    point_idx = point_order[lo:hi]
+                    window_points = (
+                        point_rows[point_idx] - int(window.row_off),
+                        point_cols[point_idx] - int(window.col_off),
+                    )
+
+                for idx, (src2, vrt) in enumerate(zip(candidates, vrts)):
+                    candidate, alpha = vrt.read([1, vrt.count], window=window)
+                    wet = candidate > 0
+                    if src2.nodata is not None:
+                        wet &= candidate != src2.nodata
+                    candidate_codes = np.where(wet, 2, 1).astype(np.uint8)
+                    candidate_codes[(alpha == 0) | ~inside] = 0
+                    clipped_dsts[idx + 1].write(
+                        np.where(inside, candidate_codes, CLASS_NODATA),
+                        1,
+                        window=window,
+                    )
+
+                    if window_points is not None:
+                        benchmark_hist, candidate_hist, _ = point_histograms[idx]
+                        benchmark_hist += class_histogram(
+                            benchmark_codes[window_points]
+                        )
+                        candidate_hist += class_histogram(
+                            candidate_codes[window_points]
+                        )
+
+                    if pwb_mask is not None:
+                        candidate_codes[pwb_mask & (candidate_codes > 0)] = 5
+                    merged = benchmark_codes + candidate_codes
+                    histograms[idx] += class_histogram(merged)
+                    if window_points is not None:
+                        point_histograms[idx][2] += class_histogram(
+                            merged[window_points]
+                        )
+                    contingency_dsts[idx].write(
+                        np.where(inside, merged, CLASS_NODATA), 1, window=window
+                    )
+        finally:
+            for dataset in (
+                vrts + candidates + clipped_dsts + contingency_dsts + mask_datasets
+            ):
+                dataset.close()
+            # Release the memory maps before their directory is removed
+            del inside_grid, pwb_grid
+        if mask_dst is not None:
+            os.replace(mask_dst.name, pwb_mask_path)
+
+    return histograms, point_histograms
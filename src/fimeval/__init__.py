@@ -1,11 +1,23 @@
-#Evaluation modules
-from .ContingencyMap.evaluationFIM import EvaluateFIM
-from .ContingencyMap.printcontingency import PrintContingencyMap
-from .ContingencyMap.plotevaluationmetrics import PlotEvaluationMetrics
-from .ContingencyMap.PWBs3 import get_PWB
+from .lazyimports import lazy_attributes
 
-#Utility modules
-from .utilis import compress_tif_lzw
+# Public entry points are imported on first use (PEP 562), so `import fimeval`
+# does not pull in plotting, S3 or building footprint dependencies
+_LAZY_ATTRS = {
+    #Evaluation modules
+    "EvaluateFIM": ".ContingencyMap.evaluationFIM",
+    "PrintContingencyMap": ".ContingencyMap.printcontingency",
+    "PlotEvaluationMetrics": ".ContingencyMap.plotevaluationmetrics",
+    "get_PWB": ".ContingencyMap.PWBs3",
+    #Utility modules
+    "compress_tif_lzw": ".utilis",
+    # Evaluation with Building foorprint module
+    "EvaluationWithBuildingFootprint": ".BuildingFootprint.evaluationwithBF",
+    #Subpackages, e.g. fimeval.ContingencyMap.EvaluateFIM
+    "ContingencyMap": None,
+    "BuildingFootprint": None,
+    "utilis": None,
+}
 
-# Evaluation with Building foorprint module
-from .BuildingFootprint.evaluationwithBF import EvaluationWithBuildingFootprint
+__all__ = [name for name, module in _LAZY_ATTRS.items() if module is not None]
+
+__getattr__, __dir__ = lazy_attributes(__name__, _LAZY_ATTRS)
@@ -0,0 +1,95 @@
+import argparse
+import sys
+
+from .ContingencyMap.evaluationFIM import EvaluateFIM
+
+
+# Command line entry point for running EvaluateFIM on a batch of case folders
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="fimeval-evaluate",
+        description="Evaluate flood inundation maps against a benchmark FIM.",
+    )
+    parser.add_argument("main_dir", help="Case study folder or folder of case folders")
+    parser.add_argument(
+        "method_name", help="smallest_extent, convex_hull or AOI boundary method"
+    )
+    parser.add_argument("output_dir", help="Directory where results are written")
+    parser.add_argument("--pwb-dir", help="User defined permanent water bodies file")
+    parser.add_argument("--shapefile-dir", help="AOI vector file for the AOI method")
+    parser.add_argument("--target-crs", help="Projected CRS to harmonize FIMs to")
+    parser.add_argument(
+        "--target-resolution", type=float, help="Resolution to resample FIMs to"
+    )
+    parser.add_argument(
+        "--streaming",
+        action="store_true",
+        help="Evaluate block by block to bound memory use",
+    )
+    parser.add_argument(
+        "--block-size", type=int, help="Window size in pixels for --streaming"
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        help="Number of case folders evaluated in parallel",
+    )
+    parser.add_argument(
+        "--candidate-workers",
+        type=int,
+        help="Number of candidates evaluated concurrently within a case",
+    )
+    parser.add_argument(
+        "--cache-pwb-mask",
+        action="store_true",
+        help="Keep the rasterized PWB mask so reruns skip rasterization",
+    )
+    parser.add_argument(
+        "--keep-harmonized",
+        action="store_true",
+        help="Write the harmonized FIMs to each case's processing folder",
+    )
+    parser.add_argument(
+        "--building-footprint",
+        help="Building footprint file for building based metrics",
+    )
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="Only evaluate candidates that changed since the previous run",
+    )
+    parser.add_argument(
+        "--result-cache",
+        help="Directory caching evaluation results across output folders",
+    )
+    parser.add_argument(
+        "--results-sink",
+        help="SQLite database (.db) or Parquet dataset directory collecting "
+        "one row per evaluated candidate across cases",
+    )
+    args = parser.parse_args(argv)
+
+    summary = EvaluateFIM(
+        args.main_dir,
+        args.method_name,
+        args.output_dir,
+        PWB_dir=args.pwb_dir,
+        shapefile_dir=args.shapefile_dir,
+        target_crs=args.target_crs,
+        target_resolution=args.target_resolution,
+        streaming=args.streaming,
+        block_size=args.block_size,
+        workers=args.workers,
+        candidate_workers=args.candidate_workers,
+        cache_pwb_mask=args.cache_pwb_mask,
+        keep_harmonized=args.keep_harmonized,
+        building_footprint=args.building_footprint,
+        incremental=args.incremental,
+        result_cache=args.result_cache,
+        results_sink=args.results_sink,
+    )
+    return 1 if summary["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
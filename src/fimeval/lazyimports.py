@@ -0,0 +1,26 @@
+import sys
+import importlib
+
+
+def lazy_attributes(package_name, lazy_attrs):
+    """
+    PEP 562 __getattr__ and __dir__ of a package whose public names are imported
+    on first use. lazy_attrs maps each name to the module defining it, relative
+    to the package, or to None when the name is a subpackage/module itself.
+    """
+    package = sys.modules[package_name]
+
+    def __getattr__(name):
+        if name not in lazy_attrs:
+            raise AttributeError(f"module {package_name!r} has no attribute {name!r}")
+        if lazy_attrs[name] is None:
+            value = importlib.import_module(f".{name}", package_name)
+        else:
+            value = getattr(importlib.import_module(lazy_attrs[name], package_name), name)
+        setattr(package, name, value)
+        return value
+
+    def __dir__():
+        return sorted(set(vars(package)) | set(lazy_attrs))
+
+    return __getattr__, __dir__
@@ -1,11 +1,67 @@
 import os
+import uuid
 import shutil
 import pyproj
 import rasterio
+import rasterio.shutil
 from pathlib import Path
+from collections import namedtuple
 import geopandas as gpd
+from rasterio.vrt import WarpedVRT
 from rasterio.warp import calculate_default_transform, reproject, Resampling
 
+#Nodata code of the uint8 class rasters (clipped FIMs and contingency maps)
+CLASS_NODATA = 255
+
+#Tiled, compressed uint8 profile for the class rasters written by the evaluation
+def class_raster_profile(crs, transform, width, height):
+    return {
+        "driver": "GTiff",
+        "dtype": "uint8",
+        "count": 1,
+        "nodata": CLASS_NODATA,
+        "crs": crs,
+        "transform": transform,
+        "width": width,
+        "height": height,
+        "tiled": True,
+        "blockxsize": 256,
+        "blockysize": 256,
+        "compress": "lzw",
+    }
+
+#Internal overviews of a class raster, mode resampling keeps the class codes intact
+def build_class_overviews(raster_path, min_size=256):
+    with rasterio.open(raster_path, "r+") as dst:
+        factors = []
+        factor = 2
+        while max(dst.width, dst.height) / factor >= min_size:
+            factors.append(factor)
+            factor *= 2
+        if factors:
+            dst.build_overviews(factors, Resampling.mode)
+            dst.update_tags(ns="rio_overview", resampling="mode")
+
+#Non-empty features of a vector source around a boundary, in the source CRS
+def read_features_around(source, boundary):
+    """
+    source is a GeoDataFrame or a vector file path, boundary a GeoSeries. Files
+    are read with the boundary bounding box so only nearby features are loaded.
+    Returns the features and the boundary reprojected to the source CRS.
+    """
+    if isinstance(source, gpd.GeoDataFrame):
+        source_crs = source.crs
+    else:
+        source_crs = gpd.read_file(source, rows=1).crs
+
+    # Densify before reprojecting so the bbox still covers the boundary
+    if source_crs is not None and not boundary.crs.equals(source_crs):
+        boundary = boundary.segmentize(boundary.length.max() / 1024).to_crs(source_crs)
+    if not isinstance(source, gpd.GeoDataFrame):
+        source = gpd.read_file(source, bbox=tuple(boundary.total_bounds))
+    source = source[source.geometry.notna() & ~source.geometry.is_empty]
+    return source, boundary
+
 #Lossless compression to reduce the file size
 def compress_tif_lzw(tif_path):
     # Read original file
@@ -106,34 +162,54 @@ def resample_to_resolution(src_path, x_resolution, y_resolution):
     os.remove(src_path)        # delete original
     os.rename(temp_path, src_path)  
 
-#Check if the FIMs are in the same CRS or not else do further operation
-def MakeFIMsUniform(fim_dir, target_crs=None, target_resolution=None):
-    fim_dir = Path(fim_dir)
-    tif_files = list(fim_dir.glob('*.tif'))
-    if not tif_files:
-        print(f"No TIFF files found in {fim_dir}")
-        return
+#Raster header fields shared by the harmonization, boundary methods and evaluation
+class RasterMetadata(
+    namedtuple(
+        "RasterMetadata",
+        ["crs", "transform", "width", "height", "bounds", "dtype", "nodata", "block_shape"],
+    )
+):
+    __slots__ = ()
 
-    # Create processing folder to save standardized files
-    processing_folder = fim_dir / 'processing'
-    processing_folder.mkdir(exist_ok=True)
+    @property
+    def shape(self):
+        return (self.height, self.width)
 
-    # Collect info about each TIFF
-    crs_list, resolutions, bounds_list, projected_flags = [], [], [], []
-    for tif_path in tif_files:
-        try:
-            with rasterio.open(tif_path) as src:
-                crs_list.append(src.crs)
-                resolutions.append(src.res)
-                bounds_list.append(src.bounds)
-                projected_flags.append(is_projected_crs(src.crs))
-        except Exception as e:
-            print(f"Error opening {tif_path}: {e}")
-            return
+#Metadata of an open dataset, pixel data is never read
+def dataset_metadata(src):
+    return RasterMetadata(
+        src.crs,
+        src.transform,
+        src.width,
+        src.height,
+        src.bounds,
+        src.dtypes[0],
+        src.nodata,
+        src.block_shapes[0],
+    )
+
+def read_raster_metadata(raster_path):
+    with rasterio.open(raster_path) as src:
+        return dataset_metadata(src)
+
+#Catalog entry of a raster, read from its header when it is not catalogued
+def raster_metadata(raster_path, catalog=None):
+    if catalog is not None and str(raster_path) in catalog:
+        return catalog[str(raster_path)]
+    return read_raster_metadata(raster_path)
+
+#Target grid (crs, transform, width, height) of each FIM after harmonization, None when the FIM is used as is
+def harmonized_grids(sources, target_crs=None, target_resolution=None):
+    # Collect info about each TIFF from its catalogued metadata
+    crs_list = [meta.crs for meta in sources]
+    grids = [(meta.crs, meta.transform, meta.width, meta.height) for meta in sources]
+    bounds_list = [meta.bounds for meta in sources]
+    projected_flags = [is_projected_crs(crs) for crs in crs_list]
 
     #CRS Check & Reproject if needed
     all_projected = all(projected_flags)
     all_same_crs = len(set(crs_list)) == 1
+    reprojected = [False] * len(sources)
 
     if not all_projected or (all_projected and not all_same_crs):
         # Decide CRS to use
@@ -145,37 +221,130 @@ def MakeFIMsUniform(fim_dir, target_crs=None, target_resolution=None):
             else:
                 print("Mixed or non-CONUS CRS detected. Please provide a valid target CRS.")
                 return
-            
+
         print(f"Reprojecting all rasters to {final_crs}")
-        for src_path in tif_files:
-            dst_path = processing_folder / src_path.name
-            reprojectFIMs(str(src_path), str(dst_path), final_crs)
-            compress_tif_lzw(dst_path) 
-            
+        final_crs = rasterio.crs.CRS.from_user_input(final_crs)
+        for idx, (crs, transform, width, height) in enumerate(grids):
+            if crs != final_crs:
+                transform, width, height = calculate_default_transform(
+                    crs, final_crs, width, height, *bounds_list[idx]
+                )
+                grids[idx] = (final_crs, transform, width, height)
+                reprojected[idx] = True
     else:
-        print("All rasters are in the same projected CRS. Copying to processing folder.")
-        for src_path in tif_files:
-            shutil.copy(src_path, processing_folder / src_path.name)
+        print("All rasters are in the same projected CRS.")
 
     # Resolution Check & Resample if needed
-    processed_tifs = list(processing_folder.glob('*.tif'))
-    final_resolutions = []
-    for tif_path in processed_tifs:
-        with rasterio.open(tif_path) as src:
-            final_resolutions.append(src.res)
-
-    unique_res = set(final_resolutions)
+    final_resolutions = [(transform.a, -transform.e) for _, transform, _, _ in grids]
+    resolution = None
     if target_resolution:
         print(f"Resampling all rasters to target resolution: {target_resolution}m.")
-        for src_path in processed_tifs:
-            resample_to_resolution(str(src_path), target_resolution, target_resolution)
+        resolution = (target_resolution, target_resolution)
 
     # Otherwise, only resample if resolutions are inconsistent
-    elif len(unique_res) > 1:
+    elif len(set(final_resolutions)) > 1:
         coarsest_x = max(res[0] for res in final_resolutions)
         coarsest_y = max(res[1] for res in final_resolutions)
         print(f"Using coarsest resolution: X={coarsest_x}, Y={coarsest_y}")
-        for src_path in processed_tifs:
-            resample_to_resolution(str(src_path), coarsest_x, coarsest_y)
+        resolution = (coarsest_x, coarsest_y)
     else:
         print("All rasters already have the same resolution. No resampling needed.")
+
+    if resolution:
+        x_resolution, y_resolution = resolution
+        for idx, (crs, transform, width, height) in enumerate(grids):
+            left, top = transform.c, transform.f
+            right, bottom = transform * (width, height)
+            grids[idx] = (
+                crs,
+                rasterio.transform.from_origin(left, top, x_resolution, y_resolution),
+                int((right - left) / x_resolution),
+                int((top - bottom) / y_resolution),
+            )
+            reprojected[idx] = True
+
+    return [grid if changed else None for grid, changed in zip(grids, reprojected)]
+
+#Lazy nearest-neighbour warp of an open FIM onto its harmonized grid
+def harmonized_vrt(src, grid):
+    crs, transform, width, height = grid
+    return WarpedVRT(
+        src,
+        crs=crs,
+        transform=transform,
+        width=width,
+        height=height,
+        resampling=Resampling.nearest,
+    )
+
+#Check if the FIMs are in the same CRS or not else do further operation
+def MakeFIMsUniform(
+    fim_dir, target_crs=None, target_resolution=None, virtual=False, catalog=None
+):
+    """
+    Harmonize the CRS and resolution of the FIMs in fim_dir and return their paths.
+    Each FIM is reprojected and resampled in a single warp, written once as a
+    GTiff. With virtual=True the GTiffs are kept in memory (/vsimem) and nothing
+    is written to disk; release them with release_harmonized. Otherwise they are
+    written into fim_dir/processing. Both modes hold the same pixels, and the
+    evaluation never re-runs the (approximate) reprojection on its reads.
+
+    When a catalog dict is given it is filled with the RasterMetadata of every
+    returned path, so later steps do not reopen the rasters for their headers.
+    """
+    fim_dir = Path(fim_dir)
+    tif_files = sorted(fim_dir.glob('*.tif'))
+    if not tif_files:
+        print(f"No TIFF files found in {fim_dir}")
+        return
+
+    # Single header scan of the case
+    sources = []
+    for tif_path in tif_files:
+        try:
+            sources.append(read_raster_metadata(tif_path))
+        except Exception as e:
+            print(f"Error opening {tif_path}: {e}")
+            return
+    if catalog is None:
+        catalog = {}
+
+    grids = harmonized_grids(sources, target_crs, target_resolution)
+    if grids is None:
+        return
+
+    if virtual:
+        vsi_dir = f"/vsimem/fimeval/{uuid.uuid4().hex}"
+    else:
+        # Create processing folder to save standardized files
+        processing_folder = fim_dir / 'processing'
+        processing_folder.mkdir(exist_ok=True)
+
+    harmonized = []
+    for src_path, meta, grid in zip(tif_files, sources, grids):
+        if grid is None:
+            if virtual:
+                dst_path = src_path
+            else:
+                dst_path = processing_folder / src_path.name
+                shutil.copy(src_path, dst_path)
+            catalog[str(dst_path)] = meta
+            harmonized.append(dst_path)
+            continue
+
+        if virtual:
+            dst_path = Path(f"{vsi_dir}/{src_path.stem}.tif")
+        else:
+            dst_path = processing_folder / src_path.name
+        with rasterio.open(src_path) as src, harmonized_vrt(src, grid) as vrt:
+            rasterio.shutil.copy(vrt, str(dst_path), driver="GTiff", compress="lzw")
+        # The GTiff block layout is only known once it is written
+        catalog[str(dst_path)] = read_raster_metadata(dst_path)
+        harmonized.append(dst_path)
+    return harmonized
+
+#Free the in-memory GTiffs created by MakeFIMsUniform(virtual=True)
+def release_harmonized(paths):
+    for path in paths or []:
+        if str(path).startswith("/vsimem/"):
+            rasterio.shutil.delete(str(path))
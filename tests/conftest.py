@@ -0,0 +1,31 @@
+import os
+import sys
+
+import pytest
+import geopandas as gpd
+
+# The synthetic cases and the asv suite live in the benchmarks folder at the repo root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.synthetic import make_case, fim_bounds, CRS  # noqa: E402
+
+
+# Write a synthetic case under root, returns (case_dir, pwb_path, buildings_path)
+@pytest.fixture(scope="session")
+def synthetic_case():
+    def make(root, size, candidates=2, buildings=10):
+        return make_case(str(root), size, candidates=candidates, buildings=buildings)
+
+    return make
+
+
+# Write a circular AOI of the given radius (m) centred on a synthetic case
+@pytest.fixture(scope="session")
+def synthetic_aoi():
+    def make(path, size, radius):
+        gpd.GeoDataFrame(
+            geometry=[fim_bounds(size).centroid.buffer(radius)], crs=CRS
+        ).to_file(str(path))
+        return str(path)
+
+    return make
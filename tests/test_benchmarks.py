@@ -0,0 +1,33 @@
+import inspect
+import pytest
+
+from benchmarks import benchmarks
+
+BENCHMARK_CLASSES = [
+    cls
+    for _, cls in inspect.getmembers(benchmarks, inspect.isclass)
+    if cls.__module__ == benchmarks.__name__
+]
+
+
+# Smallest parameter combination of an asv benchmark class
+def first_params(cls):
+    params = cls.params
+    if params and isinstance(params[0], (list, tuple)):
+        return [values[0] for values in params]
+    return [params[0]]
+
+
+# Run every timed benchmark once so the suite does not rot between asv runs
+@pytest.mark.parametrize("cls", BENCHMARK_CLASSES, ids=lambda cls: cls.__name__)
+def test_benchmark_runs(cls):
+    params = first_params(cls)
+    bench = cls()
+    bench.setup(*params)
+    try:
+        for name in dir(bench):
+            if name.startswith("time_"):
+                getattr(bench, name)(*params)
+    finally:
+        if hasattr(bench, "teardown"):
+            bench.teardown(*params)
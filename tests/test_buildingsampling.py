@@ -0,0 +1,102 @@
+import os
+
+import numpy as np
+import rasterio
+import geopandas as gpd
+from rasterio.transform import from_origin
+from shapely.geometry import box
+
+from fimeval.BuildingFootprint.evaluationwithBF import (
+    building_centroids,
+    read_pixels_by_block,
+    sample_class_histograms,
+)
+
+
+class RecordingReader:
+    """Dataset wrapper that records the windows read from it."""
+
+    def __init__(self, src):
+        self.src = src
+        self.windows = []
+
+    def __getattr__(self, name):
+        return getattr(self.src, name)
+
+    def read(self, *args, window=None, **kwargs):
+        self.windows.append(window)
+        return self.src.read(*args, window=window, **kwargs)
+
+
+def write_classes(path):
+    data = np.random.default_rng(0).integers(0, 6, size=(300, 300), dtype=np.uint8)
+    with rasterio.open(
+        path,
+        "w",
+        driver="GTiff",
+        width=300,
+        height=300,
+        count=1,
+        dtype="uint8",
+        crs="EPSG:32616",
+        transform=from_origin(0, 3000, 10, 10),
+        tiled=True,
+        blockxsize=64,
+        blockysize=64,
+    ) as dst:
+        dst.write(data, 1)
+    return data
+
+
+def test_points_are_read_from_native_blocks(tmp_path):
+    path = str(tmp_path / "classes.tif")
+    data = write_classes(path)
+
+    rng = np.random.default_rng(1)
+    rows, cols = rng.integers(0, 300, size=(2, 50))
+    with rasterio.open(path) as src:
+        reader = RecordingReader(src)
+        values = read_pixels_by_block(reader, rows, cols)
+
+    np.testing.assert_array_equal(values, data[rows, cols])
+    assert all(w.width <= 64 and w.height <= 64 for w in reader.windows)
+    blocks = {(r // 64, c // 64) for r, c in zip(rows, cols)}
+    assert len(reader.windows) == len(blocks)
+
+
+# A boundary without buildings (sparse rural scenes) reads nothing and counts nothing
+def test_boundary_without_buildings(tmp_path):
+    path = str(tmp_path / "classes.tif")
+    write_classes(path)
+    with rasterio.open(path) as src:
+        reader = RecordingReader(src)
+        empty = np.empty(0, dtype=np.int64)
+        assert read_pixels_by_block(reader, empty, empty).size == 0
+    assert reader.windows == []
+
+    # Buildings outside the raster extent
+    (histogram,) = sample_class_histograms([path], [-100.0], [-100.0])
+    assert histogram.sum() == 0
+
+
+def test_building_centroid_cache_keeps_only_the_current_entry(tmp_path):
+    buildings_path = str(tmp_path / "buildings.gpkg")
+    gpd.GeoDataFrame(
+        geometry=[box(x, x, x + 5, x + 5) for x in range(0, 1000, 10)],
+        crs="EPSG:32616",
+    ).to_file(buildings_path)
+    cache_dir = str(tmp_path / "BuildingFootprint")
+
+    def centroids(size):
+        study_area = gpd.GeoDataFrame(geometry=[box(0, 0, size, size)], crs="EPSG:32616")
+        crs = rasterio.crs.CRS.from_epsg(32616)
+        return building_centroids(buildings_path, study_area, crs, cache_dir)
+
+    first = centroids(500)
+    assert len(first[0]) == 50
+    second = centroids(200)
+    assert len(second[0]) == 20
+    assert len(os.listdir(cache_dir)) == 1
+    # The remaining entry is the one of the current boundary
+    np.testing.assert_array_equal(centroids(200)[0], second[0])
+    assert len(os.listdir(cache_dir)) == 1
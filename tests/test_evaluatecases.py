@@ -0,0 +1,36 @@
+import multiprocessing
+
+import pytest
+
+from fimeval.ContingencyMap import evaluationFIM
+
+
+def fail_on_broken_case(folder, gdf, result_rows=None, **kwargs):
+    if folder.name == "a_broken":
+        raise ValueError("unreadable benchmark")
+    return {"CSI_values": [1.0]}
+
+
+# A failing case is reported with its traceback and the remaining cases still run
+@pytest.mark.parametrize("workers", [None, 2], ids=["serial", "pool"])
+def test_case_failure_is_isolated(tmp_path, monkeypatch, workers):
+    for name in ("a_broken", "b_case"):
+        (tmp_path / name).mkdir()
+        (tmp_path / name / "BM_benchmark.tif").touch()
+
+    # Forked pool workers see the patched evaluate_case too
+    if workers and multiprocessing.get_start_method() != "fork":
+        pytest.skip("pool workers only inherit the patch when forked")
+    monkeypatch.setattr(evaluationFIM, "evaluate_case", fail_on_broken_case)
+    summary = evaluationFIM.EvaluateFIM(
+        tmp_path,
+        "smallest_extent",
+        tmp_path / "out",
+        PWB_dir="pwb.shp",
+        workers=workers,
+    )
+
+    assert summary["succeeded"] == ["b_case"]
+    assert summary["failed"] == {"a_broken": "ValueError: unreadable benchmark"}
+    assert list(summary["tracebacks"]) == ["a_broken"]
+    assert "in fail_on_broken_case" in summary["tracebacks"]["a_broken"]
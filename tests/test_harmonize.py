@@ -0,0 +1,52 @@
+import os
+
+import numpy as np
+import rasterio
+import geopandas as gpd
+from rasterio.warp import calculate_default_transform, reproject, Resampling
+
+from fimeval.ContingencyMap.evaluationFIM import evaluate_case
+
+COUNTS = ["TN_values", "FP_values", "FN_values", "TP_values"]
+
+
+# Rewrite a FIM in another CRS, so the case has to be reprojected
+def reproject_fim(path, crs):
+    with rasterio.open(path) as src:
+        transform, width, height = calculate_default_transform(
+            src.crs, crs, src.width, src.height, *src.bounds
+        )
+        profile = src.profile
+        profile.update(crs=crs, transform=transform, width=width, height=height)
+        data = np.zeros((height, width), dtype=profile["dtype"])
+        reproject(
+            src.read(1),
+            data,
+            src_transform=src.transform,
+            src_crs=src.crs,
+            dst_transform=transform,
+            dst_crs=crs,
+            resampling=Resampling.nearest,
+        )
+    with rasterio.open(path, "w", **profile) as dst:
+        dst.write(data, 1)
+
+
+# Virtual and written harmonized FIMs must be evaluated on the same pixels
+def test_virtual_and_kept_harmonized_counts_match(tmp_path, synthetic_case):
+    case_dir, pwb_path, _ = synthetic_case(tmp_path, 600)
+    reproject_fim(os.path.join(case_dir, "model1.tif"), "EPSG:4326")
+    gdf = gpd.read_file(pwb_path)
+
+    counts = []
+    for keep_harmonized in (False, True):
+        results = evaluate_case(
+            case_dir,
+            gdf,
+            "smallest_extent",
+            str(tmp_path / f"out_{keep_harmonized}"),
+            keep_harmonized=keep_harmonized,
+        )
+        counts.append([results[count] for count in COUNTS])
+
+    assert counts[0] == counts[1]
@@ -0,0 +1,81 @@
+import os
+import sys
+import json
+import subprocess
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src")
+
+# Heavy optional dependencies that `import fimeval` must not load
+HEAVY_MODULES = ["matplotlib", "plotly", "pandas", "geopandas", "ee", "msfootprint"]
+
+# Allowed extra import time of fimeval over numpy + rasterio, in seconds
+IMPORT_BUDGET = float(os.environ.get("FIMEVAL_IMPORT_BUDGET", "0.5"))
+
+
+def run_python(code):
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [SRC_DIR, env.get("PYTHONPATH")]))
+    result = subprocess.run(
+        [sys.executable, "-c", code], env=env, capture_output=True, text=True, check=True
+    )
+    return json.loads(result.stdout)
+
+
+# Best of a few fresh interpreters, to keep the timing stable
+def import_time(statement, repeat=3):
+    code = (
+        "import time, json\n"
+        "start = time.perf_counter()\n"
+        f"{statement}\n"
+        "print(json.dumps(time.perf_counter() - start))\n"
+    )
+    return min(run_python(code) for _ in range(repeat))
+
+
+def test_import_does_not_load_heavy_dependencies():
+    loaded = run_python(
+        "import sys, json, fimeval\n"
+        f"print(json.dumps([m for m in {HEAVY_MODULES!r} if m in sys.modules]))\n"
+    )
+    assert loaded == []
+
+
+def test_entry_points_resolve_lazily():
+    names = run_python(
+        "import json, fimeval\n"
+        "print(json.dumps([getattr(fimeval, name).__name__ for name in fimeval.__all__]))\n"
+    )
+    assert sorted(names) == sorted(
+        [
+            "EvaluateFIM",
+            "PrintContingencyMap",
+            "PlotEvaluationMetrics",
+            "get_PWB",
+            "compress_tif_lzw",
+            "EvaluationWithBuildingFootprint",
+        ]
+    )
+
+
+# Subpackages are reachable as attributes of fimeval, as they were before lazy imports
+def test_subpackages_resolve_lazily():
+    names = run_python(
+        "import json, fimeval\n"
+        "print(json.dumps([\n"
+        "    [name in dir(fimeval), getattr(fimeval, name).__name__]\n"
+        "    for name in ('ContingencyMap', 'BuildingFootprint', 'utilis')\n"
+        "] + [fimeval.ContingencyMap.EvaluateFIM is fimeval.EvaluateFIM]))\n"
+    )
+    assert names == [
+        [True, "fimeval.ContingencyMap"],
+        [True, "fimeval.BuildingFootprint"],
+        [True, "fimeval.utilis"],
+        True,
+    ]
+
+
+def test_import_time_regression():
+    baseline = import_time("import numpy, rasterio")
+    fimeval_time = import_time("import numpy, rasterio, fimeval")
+    print(f"import numpy+rasterio: {baseline:.3f}s, with fimeval: {fimeval_time:.3f}s")
+    assert fimeval_time - baseline < IMPORT_BUDGET
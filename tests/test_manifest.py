@@ -0,0 +1,155 @@
+import os
+import shutil
+
+import pandas as pd
+import pytest
+import geopandas as gpd
+
+from fimeval.ContingencyMap.evaluationFIM import evaluateFIM, evaluate_case
+from fimeval.ContingencyMap.manifest import load_manifest
+
+
+@pytest.fixture
+def case(tmp_path, synthetic_case):
+    case_dir, pwb_path, _ = synthetic_case(tmp_path, 200)
+    return case_dir, pwb_path, str(tmp_path / "out")
+
+
+def save_dir(case):
+    _, _, output_dir = case
+    return os.path.join(output_dir, "case", "smallest_extent")
+
+
+# Names of the candidates evaluated (not reused) by an incremental run
+def evaluate(case, candidates=("model0", "model1")):
+    case_dir, pwb_path, output_dir = case
+    rows = []
+    results = evaluateFIM(
+        os.path.join(case_dir, "BM_benchmark.tif"),
+        [os.path.join(case_dir, f"{name}.tif") for name in candidates],
+        pwb_path,
+        case_dir,
+        "smallest_extent",
+        output_dir,
+        incremental=True,
+        result_rows=rows,
+    )
+    return [row["candidate"] for row in rows], results
+
+
+def metrics_csv(case):
+    return pd.read_csv(
+        os.path.join(save_dir(case), "EvaluationMetrics", "EvaluationMetrics.csv"),
+        float_precision="round_trip",
+    )
+
+
+def test_unchanged_rerun_is_skipped(case):
+    evaluated, first = evaluate(case)
+    assert evaluated == ["model0", "model1"]
+
+    evaluated, second = evaluate(case)
+    assert evaluated == []
+    assert second == first
+
+
+def test_skipped_rerun_refreshes_the_manifest(case):
+    case_dir = case[0]
+    evaluate(case)
+    # Same content, new mtime: no re-evaluation, but the manifest records the new mtime
+    model0 = os.path.join(case_dir, "model0.tif")
+    os.utime(model0, ns=(0, 0))
+    evaluated, _ = evaluate(case)
+
+    assert evaluated == []
+    assert load_manifest(save_dir(case))["files"][model0]["mtime_ns"] == 0
+
+
+def test_new_candidate_is_evaluated_alone(case):
+    case_dir = case[0]
+    evaluate(case)
+    before = metrics_csv(case)
+    shutil.copy(
+        os.path.join(case_dir, "model0.tif"), os.path.join(case_dir, "model2.tif")
+    )
+    evaluated, _ = evaluate(case, ("model0", "model1", "model2"))
+
+    assert evaluated == ["model2"]
+    after = metrics_csv(case)
+    assert list(after.columns) == ["Metrics", "model0", "model1", "model2"]
+    pd.testing.assert_frame_equal(after[before.columns], before)
+    assert after["model2"].tolist() == after["model0"].tolist()
+
+
+def test_removed_candidate_is_dropped_from_the_csv(case):
+    evaluate(case)
+    evaluated, results = evaluate(case, ("model0",))
+
+    assert evaluated == []
+    assert list(metrics_csv(case).columns) == ["Metrics", "model0"]
+    assert all(len(values) == 1 for values in results.values())
+
+
+# A modified candidate is re-evaluated in place, the merged columns keep their order
+def test_modified_candidate_is_reevaluated(case):
+    case_dir = case[0]
+    evaluate(case)
+    before = metrics_csv(case)
+    shutil.copy(
+        os.path.join(case_dir, "model1.tif"), os.path.join(case_dir, "model0.tif")
+    )
+    evaluated, _ = evaluate(case)
+
+    assert evaluated == ["model0"]
+    after = metrics_csv(case)
+    assert list(after.columns) == ["Metrics", "model0", "model1"]
+    assert after["model1"].tolist() == before["model1"].tolist()
+    assert after["model0"].tolist() == after["model1"].tolist()
+
+
+def test_changed_boundary_reevaluates_every_candidate(case, synthetic_aoi):
+    case_dir, pwb_path, output_dir = case
+    aoi_path = os.path.join(case_dir, "aoi.shp")
+
+    def evaluate_aoi(radius):
+        synthetic_aoi(aoi_path, 200, radius)
+        rows = []
+        evaluateFIM(
+            os.path.join(case_dir, "BM_benchmark.tif"),
+            [os.path.join(case_dir, f"model{i}.tif") for i in range(2)],
+            pwb_path,
+            case_dir,
+            "AOI",
+            output_dir,
+            shapefile=aoi_path,
+            incremental=True,
+            result_rows=rows,
+        )
+        return [row["candidate"] for row in rows]
+
+    assert evaluate_aoi(600) == ["model0", "model1"]
+    assert evaluate_aoi(600) == []
+    assert evaluate_aoi(800) == ["model0", "model1"]
+
+
+def test_changed_grid_reevaluates_every_candidate(case):
+    case_dir, pwb_path, output_dir = case
+    gdf = gpd.read_file(pwb_path)
+
+    def evaluate_grid(target_resolution):
+        rows = []
+        evaluate_case(
+            case_dir,
+            gdf,
+            "smallest_extent",
+            output_dir,
+            target_resolution=target_resolution,
+            incremental=True,
+            result_rows=rows,
+        )
+        return [row["candidate"] for row in rows]
+
+    assert evaluate_grid(None) == ["model0", "model1"]
+    assert evaluate_grid(None) == []
+    assert evaluate_grid(20) == ["model0", "model1"]
+
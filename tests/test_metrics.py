@@ -0,0 +1,61 @@
+import numpy as np
+import pytest
+
+from fimeval.ContingencyMap.metrics import (
+    class_histogram,
+    confusion_counts,
+    confusion_counts_batch,
+    evaluationmetrics,
+)
+
+
+# Benchmark (0/2) and candidate (0/1/2/5) class arrays, as evaluateFIM builds them
+def class_arrays(shape, n_candidates, seed=0):
+    rng = np.random.default_rng(seed)
+    benchmark = rng.choice(np.array([0, 2], dtype=np.uint8), size=shape)
+    candidates = [
+        rng.choice(np.array([0, 1, 2, 5], dtype=np.uint8), size=shape)
+        for _ in range(n_candidates)
+    ]
+    return benchmark, candidates
+
+
+# Counts of the classes as np.unique found them before the bincount kernel
+def unique_counts(merged):
+    values, counts = np.unique(merged, return_counts=True)
+    found = dict(zip(values.tolist(), counts.tolist()))
+    return tuple(found.get(code, 0) for code in (1, 2, 3, 4))
+
+
+def test_fused_counts_match_evaluationmetrics():
+    benchmark, candidates = class_arrays((300, 200), 3)
+    expected = [tuple(evaluationmetrics(benchmark, c)[1]) for c in candidates]
+
+    assert [confusion_counts(benchmark, c) for c in candidates] == expected
+    assert confusion_counts_batch(benchmark, candidates) == expected
+    assert expected == [unique_counts(benchmark + c) for c in candidates]
+
+
+@pytest.mark.parametrize("dtype", [np.float32, np.float64, np.int16, np.int32])
+def test_out_of_range_codes_are_not_counted(dtype):
+    benchmark = np.array([255, 2, 0, -1, 0, 2], dtype=dtype)
+    candidate = np.array([2, 2, 1, 1, 254, 1], dtype=dtype)
+
+    # 255 + 2 and 0 + 254 must not wrap into TN/FP
+    assert evaluationmetrics(benchmark, candidate)[1] == (1, 0, 1, 1)
+    assert confusion_counts(benchmark, candidate) == (1, 0, 1, 1)
+    assert confusion_counts(benchmark, candidate) == unique_counts(
+        benchmark + candidate
+    )
+
+
+def test_uint8_sums_do_not_wrap():
+    benchmark = np.array([255, 255, 2], dtype=np.uint8)
+    candidate = np.array([2, 3, 2], dtype=np.uint8)
+    assert confusion_counts(benchmark, candidate) == (0, 0, 0, 1)
+
+
+def test_fractional_values_are_not_class_codes():
+    histogram = class_histogram(np.array([1.5, 1.0, 4.0, np.nan]))
+    assert histogram[1] == histogram[4] == 1
+    assert histogram.sum() == 2
@@ -0,0 +1,91 @@
+import os
+import shutil
+import hashlib
+import datetime
+
+import pytest
+import geopandas as gpd
+from shapely.geometry import box
+
+from fimeval.ContingencyMap import PWBs3
+
+
+class LocalS3:
+    """Minimal S3 stand-in serving the objects of a local folder."""
+
+    def __init__(self, root):
+        self.root = root
+        self.downloads = 0
+
+    def list_objects_v2(self, Bucket, Prefix):
+        contents = []
+        for name in sorted(os.listdir(os.path.join(self.root, Prefix))):
+            path = os.path.join(self.root, Prefix, name)
+            with open(path, "rb") as f:
+                etag = hashlib.md5(f.read()).hexdigest()
+            contents.append(
+                {
+                    "Key": Prefix + name,
+                    "ETag": f'"{etag}"',
+                    "LastModified": datetime.datetime.fromtimestamp(
+                        os.path.getmtime(path)
+                    ),
+                    "Size": os.path.getsize(path),
+                }
+            )
+        return {"Contents": contents} if contents else {}
+
+    def download_file(self, Bucket, Key, Filename):
+        self.downloads += 1
+        shutil.copy(os.path.join(self.root, Key), Filename)
+
+
+def write_pwb(bucket_dir, n):
+    folder = os.path.join(bucket_dir, PWBs3.pwb_folder)
+    os.makedirs(folder, exist_ok=True)
+    gdf = gpd.GeoDataFrame(
+        geometry=[box(i, i, i + 0.5, i + 0.5) for i in range(n)], crs="EPSG:4326"
+    )
+    gdf.to_file(os.path.join(folder, "PWB.shp"))
+
+
+@pytest.fixture
+def bucket(tmp_path):
+    write_pwb(tmp_path / "bucket", 3)
+    return LocalS3(str(tmp_path / "bucket"))
+
+
+def test_pwb_is_downloaded_once_and_reused(bucket, tmp_path):
+    cache_dir = str(tmp_path / "cache")
+    first = PWBs3.get_PWB(cache_dir=cache_dir, s3_client=bucket)
+    downloads = bucket.downloads
+    second = PWBs3.get_PWB(cache_dir=cache_dir, s3_client=bucket)
+
+    assert len(first) == len(second) == 3
+    assert bucket.downloads == downloads
+    assert first.attrs["pwb_version"] == second.attrs["pwb_version"]
+
+
+def test_pwb_cache_is_refreshed_when_bucket_changes(bucket, tmp_path):
+    cache_dir = str(tmp_path / "cache")
+    first = PWBs3.get_PWB(cache_dir=cache_dir, s3_client=bucket)
+    write_pwb(bucket.root, 5)
+    second = PWBs3.get_PWB(cache_dir=cache_dir, s3_client=bucket, max_cache_bytes=0)
+
+    assert len(second) == 5
+    assert first.attrs["pwb_version"] != second.attrs["pwb_version"]
+    # Older versions are evicted once the cache grows past its size limit
+    assert os.listdir(cache_dir) == [second.attrs["pwb_version"]]
+
+
+def test_pwb_offline_mode_uses_cached_version(bucket, tmp_path):
+    cache_dir = str(tmp_path / "cache")
+    with pytest.raises(FileNotFoundError):
+        PWBs3.get_PWB(cache_dir=cache_dir, offline=True, s3_client=bucket)
+
+    online = PWBs3.get_PWB(cache_dir=cache_dir, s3_client=bucket)
+    downloads = bucket.downloads
+    offline = PWBs3.get_PWB(cache_dir=cache_dir, offline=True, s3_client=bucket)
+
+    assert bucket.downloads == downloads
+    assert offline.attrs["pwb_version"] == online.attrs["pwb_version"]
@@ -0,0 +1,95 @@
+import os
+import shutil
+
+import pytest
+
+from fimeval.ContingencyMap.evaluationFIM import evaluateFIM
+from fimeval.ContingencyMap.resultcache import LocalResultCache
+
+COUNTS = ["TN_values", "FP_values", "FN_values", "TP_values"]
+
+
+@pytest.fixture
+def case(tmp_path, synthetic_case):
+    case_dir, pwb_path, _ = synthetic_case(tmp_path, 200)
+    return case_dir, pwb_path
+
+
+def evaluate(case, output_dir, cache_dir, candidates=("model0", "model1")):
+    case_dir, pwb_path = case
+    rows = []
+    results = evaluateFIM(
+        os.path.join(case_dir, "BM_benchmark.tif"),
+        [os.path.join(case_dir, f"{name}.tif") for name in candidates],
+        pwb_path,
+        case_dir,
+        "smallest_extent",
+        output_dir,
+        result_cache=cache_dir,
+        result_rows=rows,
+    )
+    counts = [results[count] for count in COUNTS]
+    return counts, {row["candidate"]: row["cached"] for row in rows}
+
+
+def test_cache_hit_restores_outputs(case, tmp_path):
+    cache_dir = str(tmp_path / "cache")
+    first, cached = evaluate(case, str(tmp_path / "out1"), cache_dir)
+    assert cached == {"model0": False, "model1": False}
+
+    second, cached = evaluate(case, str(tmp_path / "out2"), cache_dir)
+    assert cached == {"model0": True, "model1": True}
+    assert second == first
+    maps_dir = tmp_path / "out2" / "case" / "smallest_extent" / "ContingencyMaps"
+    assert sorted(os.listdir(maps_dir)) == [
+        "ContingencyMAP_model0.tif",
+        "ContingencyMAP_model1.tif",
+    ]
+
+
+def test_cache_miss_on_modified_candidate(case, tmp_path):
+    cache_dir = str(tmp_path / "cache")
+    evaluate(case, str(tmp_path / "out1"), cache_dir)
+
+    case_dir, _ = case
+    shutil.copy(
+        os.path.join(case_dir, "model0.tif"), os.path.join(case_dir, "model1.tif")
+    )
+    _, cached = evaluate(case, str(tmp_path / "out2"), cache_dir)
+    assert cached == {"model0": True, "model1": False}
+
+
+# Only the new candidate is evaluated, the others come from the cache
+def test_partial_restore_matches_full_evaluation(case, tmp_path):
+    case_dir, _ = case
+    shutil.copy(
+        os.path.join(case_dir, "model0.tif"), os.path.join(case_dir, "model2.tif")
+    )
+    cache_dir = str(tmp_path / "cache")
+    evaluate(case, str(tmp_path / "out1"), cache_dir)
+
+    candidates = ("model0", "model1", "model2")
+    partial, cached = evaluate(case, str(tmp_path / "out2"), cache_dir, candidates)
+    assert cached == {"model0": True, "model1": True, "model2": False}
+
+    full, _ = evaluate(case, str(tmp_path / "out3"), None, candidates)
+    assert partial == full
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    source = tmp_path / "output.bin"
+    source.write_bytes(b"x" * 100)
+    cache = LocalResultCache(tmp_path / "cache", max_bytes=250)
+
+    for key in ("aa1", "bb2"):
+        cache.put(key, {"counts": [1]}, {"output.bin": str(source)})
+    assert cache.total_bytes == 200
+    # Using the older entry makes the newer one the next to go
+    assert cache.get("aa1") is not None
+    os.utime(os.path.join(cache.entry_dir("bb2"), "result.json"), (0, 0))
+
+    cache.put("cc3", {"counts": [3]}, {"output.bin": str(source)})
+    assert cache.get("bb2") is None
+    assert cache.get("aa1")[0] == {"counts": [1]}
+    assert cache.get("cc3") is not None
+    assert cache.total_bytes == 200
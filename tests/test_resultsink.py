@@ -0,0 +1,104 @@
+import os
+import sqlite3
+
+import pytest
+
+from fimeval.ContingencyMap.evaluationFIM import evaluateFIM
+from fimeval.ContingencyMap.resultsink import (
+    RESULT_COLUMNS,
+    RESULT_TABLE,
+    ParquetResultSink,
+    SQLiteResultSink,
+    open_result_sink,
+)
+
+BUILDING_COLUMNS = [name for name, _ in RESULT_COLUMNS if name.startswith("building_")]
+
+
+@pytest.fixture(scope="module")
+def rows(tmp_path_factory, synthetic_case):
+    root = tmp_path_factory.mktemp("sink")
+    case_dir, pwb_path, buildings_path = synthetic_case(root, 200, buildings=200)
+
+    def evaluate(output_dir, **kwargs):
+        rows = []
+        evaluateFIM(
+            os.path.join(case_dir, "BM_benchmark.tif"),
+            [os.path.join(case_dir, f"model{i}.tif") for i in range(2)],
+            pwb_path,
+            case_dir,
+            "smallest_extent",
+            str(root / output_dir),
+            result_rows=rows,
+            **kwargs,
+        )
+        return rows
+
+    cache_dir = str(root / "cache")
+    with_buildings = evaluate(
+        "out1", building_footprint=buildings_path, result_cache=cache_dir
+    )
+    restored = evaluate(
+        "out2", building_footprint=buildings_path, result_cache=cache_dir
+    )
+    without_buildings = evaluate("out3")
+    return with_buildings, restored, without_buildings
+
+
+def test_building_metrics_are_filled_when_computed(rows):
+    with_buildings, restored, without_buildings = rows
+    for row in with_buildings:
+        assert all(row[name] is not None for name in BUILDING_COLUMNS)
+        assert row["building_TP"] + row["building_FN"] > 0
+    # Restored candidates keep the building metrics of the cached evaluation
+    assert [row["cached"] for row in restored] == [True, True]
+    for row, cached in zip(with_buildings, restored):
+        assert {name: cached[name] for name in BUILDING_COLUMNS} == {
+            name: row[name] for name in BUILDING_COLUMNS
+        }
+    for row in without_buildings:
+        assert not any(name in row for name in BUILDING_COLUMNS)
+
+
+def test_sqlite_sink_writes_every_column(rows, tmp_path):
+    with_buildings, _, without_buildings = rows
+    db_path = str(tmp_path / "results.db")
+    sink = open_result_sink(db_path, batch_size=3)
+    assert isinstance(sink, SQLiteResultSink)
+    with sink:
+        sink.write(with_buildings)
+        sink.write(without_buildings)
+
+    connection = sqlite3.connect(db_path)
+    connection.row_factory = sqlite3.Row
+    written = connection.execute(f"SELECT * FROM {RESULT_TABLE}").fetchall()
+    connection.close()
+
+    assert [row.keys() for row in written][0] == [name for name, _ in RESULT_COLUMNS]
+    assert len(written) == 4
+    for row, expected in zip(written, with_buildings + without_buildings):
+        assert row["candidate"] == expected["candidate"]
+        assert row["TP"] == expected["TP"]
+        assert row["CSI"] == pytest.approx(expected["CSI"])
+        for name in BUILDING_COLUMNS:
+            assert row[name] == expected.get(name)
+
+
+def test_parquet_sink_writes_every_column(rows, tmp_path):
+    # A pyarrow build that does not match the installed numpy fails with ImportError
+    pytest.importorskip("pyarrow", exc_type=ImportError)
+    import pandas as pd
+
+    with_buildings, _, without_buildings = rows
+    dataset_dir = str(tmp_path / "results")
+    sink = open_result_sink(dataset_dir, batch_size=3)
+    assert isinstance(sink, ParquetResultSink)
+    with sink:
+        sink.write(with_buildings)
+        sink.write(without_buildings)
+
+    written = pd.read_parquet(dataset_dir).sort_values(["building_TP", "candidate"])
+    assert list(written.columns) == [name for name, _ in RESULT_COLUMNS]
+    assert len(written) == 4
+    assert written["building_TP"].isna().sum() == 2
+    assert written["cached"].dtype == bool
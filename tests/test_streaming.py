@@ -0,0 +1,47 @@
+import os
+
+import pytest
+
+from fimeval.ContingencyMap.evaluationFIM import evaluateFIM
+
+COUNTS = ["TN_values", "FP_values", "FN_values", "TP_values"]
+
+
+@pytest.fixture(scope="module")
+def case(tmp_path_factory, synthetic_case, synthetic_aoi):
+    root = str(tmp_path_factory.mktemp("streaming"))
+    case_dir, pwb_path, _ = synthetic_case(root, 300)
+    aoi_path = synthetic_aoi(os.path.join(root, "aoi.shp"), 300, 1000)
+    return root, case_dir, pwb_path, aoi_path
+
+
+def evaluate(case, method, name, **kwargs):
+    root, case_dir, pwb_path, aoi_path = case
+    results = evaluateFIM(
+        os.path.join(case_dir, "BM_benchmark.tif"),
+        [os.path.join(case_dir, f"model{i}.tif") for i in range(2)],
+        pwb_path,
+        case_dir,
+        method,
+        os.path.join(root, name),
+        shapefile=aoi_path,
+        **kwargs,
+    )
+    return [results[count] for count in COUNTS]
+
+
+# Streaming counts must not depend on how the grid is cut into windows
+@pytest.mark.parametrize("method", ["convex_hull", "AOI"])
+def test_streaming_counts_match_in_memory(case, method):
+    expected = evaluate(case, method, f"memory_{method}")
+    for block_size in (37, 64, 128, 1024):
+        assert (
+            evaluate(
+                case,
+                method,
+                f"streaming_{method}_{block_size}",
+                streaming=True,
+                block_size=block_size,
+            )
+            == expected
+        ), block_size